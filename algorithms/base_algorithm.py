@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Tuple, Type
 
 from graph.graph import Edge, Vertex
 
@@ -14,3 +14,16 @@ class TreeSpanningAlgorithm:
 
     def solve(self) -> Tuple[List[Edge], float]:
         raise NotImplementedError()
+
+
+def registered_algorithms() -> List[Type[TreeSpanningAlgorithm]]:
+    # Every imported algorithm, unless its own Meta marks it as abstract
+    algorithms = []
+    pending = list(TreeSpanningAlgorithm.__subclasses__())
+    while pending:
+        algorithm = pending.pop(0)
+        pending += algorithm.__subclasses__()
+        meta = algorithm.__dict__.get('Meta', None)
+        if not getattr(meta, 'abstract', False):
+            algorithms.append(algorithm)
+    return algorithms
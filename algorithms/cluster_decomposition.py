@@ -0,0 +1,385 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Type
+
+import numpy
+
+from algorithms.base_algorithm import TreeSpanningAlgorithm
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.lower_bound import DualAscent
+from graph.graph import Edge, Vertex
+from graph.metrics import coordinates, distance_matrix, distances_from, metric_of
+
+
+# Relative slack used when comparing distances in the separation test
+EPSILON = 1e-9
+
+# Clusters with more terminals are split heuristically when no split can be proven
+MAX_CLUSTER_TERMINALS = 10
+
+
+def spanning_tree(vertices: List[Vertex]) -> List[Tuple[float, int, int]]:
+    # Prim's algorithm on the complete graph, returns (distance, index, index) for every tree edge
+    if not vertices:
+        return []
+
+    metric, points = metric_of(vertices), coordinates(vertices)
+    best = metric.one_to_many(points[0], points)
+    parent = numpy.zeros(len(vertices), dtype=int)
+    in_tree = numpy.zeros(len(vertices), dtype=bool)
+    in_tree[0] = True
+    tree = []
+    for _ in range(1, len(vertices)):
+        next_index = int(numpy.argmin(numpy.where(in_tree, numpy.inf, best)))
+        tree.append((float(best[next_index]), int(parent[next_index]), next_index))
+        in_tree[next_index] = True
+        distances = metric.one_to_many(points[next_index], points)
+        closer = distances < best
+        best[closer] = distances[closer]
+        parent[closer] = next_index
+    return tree
+
+
+def closest_pair(vertices1: List[Vertex], vertices2: List[Vertex]) -> Tuple[float, Vertex, Vertex]:
+    distances = distance_matrix(vertices1, vertices2)
+    i, j = numpy.unravel_index(numpy.argmin(distances), distances.shape)
+    return float(distances[i, j]), vertices1[i], vertices2[j]
+
+
+def join_tree(groups: List[List[Vertex]]) -> List[Tuple[float, Vertex, Vertex]]:
+    # Prim's algorithm where every group of vertices is contracted to a single vertex,
+    # returns the shortest edge used to connect every group to the tree
+    best = {i: closest_pair(groups[0], groups[i]) for i in range(1, len(groups))}
+    tree = []
+    while best:
+        next_index = min(best, key=lambda i: best[i][0])
+        tree.append(best.pop(next_index))
+        for i, current in best.items():
+            candidate = closest_pair(groups[next_index], groups[i])
+            if candidate[0] < current[0]:
+                best[i] = candidate
+    return tree
+
+
+def cluster_distances(
+    distances: numpy.ndarray,
+    labels: numpy.ndarray,
+    count: int,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # From a distance matrix and the cluster of every vertex, the distance from every vertex to the closest
+    # vertex of every cluster and the shortest distance between every two clusters. Every cluster has a vertex.
+    order = numpy.argsort(labels, kind='stable')
+    starts = numpy.searchsorted(labels[order], numpy.arange(count))
+    to_cluster = numpy.minimum.reduceat(distances[:, order], starts, axis=1)
+    return to_cluster, numpy.minimum.reduceat(to_cluster[order], starts, axis=0)
+
+
+def contracted_tree_cost(between: numpy.ndarray) -> float:
+    # Prim's algorithm on the clusters contracted to single vertices, the cost of join_tree over the clusters
+    best = between[0].copy()
+    in_tree = numpy.zeros(len(between), dtype=bool)
+    in_tree[0] = True
+    cost = 0.0
+    for _ in range(1, len(between)):
+        next_index = int(numpy.argmin(numpy.where(in_tree, numpy.inf, best)))
+        cost += float(best[next_index])
+        in_tree[next_index] = True
+        numpy.minimum(best, between[next_index], out=best)
+    return cost
+
+
+def pruned_tree_cost(terminal_vertices: List[Vertex], optional_vertices: List[Vertex]) -> float:
+    # Cost of a tree over the cluster: the spanning tree over every vertex with the optional leaves removed
+    # until every leaf is a terminal, or the spanning tree of the terminals when that is cheaper
+    vertices = terminal_vertices + optional_vertices
+    tree = spanning_tree(vertices)
+    degree = [0] * len(vertices)
+    for _, i, j in tree:
+        degree[i] += 1
+        degree[j] += 1
+
+    pruned = True
+    while pruned:
+        pruned = False
+        for edge in list(tree):
+            _, i, j = edge
+            leaf = i if degree[i] == 1 and i >= len(terminal_vertices) else j
+            if degree[leaf] == 1 and leaf >= len(terminal_vertices):
+                tree.remove(edge)
+                degree[i] -= 1
+                degree[j] -= 1
+                pruned = True
+
+    terminal_tree = sum(edge[0] for edge in spanning_tree(terminal_vertices))
+    return min(sum(edge[0] for edge in tree), terminal_tree)
+
+
+def attachment_bounds(terminal_vertices: List[Vertex], optional_vertices: List[Vertex]) -> numpy.ndarray:
+    # Lower bound of how much more a tree over the cluster costs when it also has to reach a vertex, for the
+    # terminals followed by the optional vertices. Every tree through an optional vertex costs at least the
+    # dual ascent bound plus the reduced distance from the root to it, and the optimal cluster tree costs at
+    # most the pruned spanning tree.
+    bounds = numpy.zeros(len(terminal_vertices) + len(optional_vertices))
+    if not optional_vertices:
+        return bounds
+
+    offset = len(terminal_vertices)
+    if offset == 1:
+        bounds[offset:] = distances_from(terminal_vertices[0], optional_vertices)
+        return bounds
+
+    dual_ascent = DualAscent(terminal_vertices, optional_vertices)
+    lower_bound = dual_ascent.solve()
+    upper_bound = pruned_tree_cost(terminal_vertices, optional_vertices)
+    bounds[offset:] = numpy.maximum(lower_bound + dual_ascent.root_distances()[offset:] - upper_bound, 0.0)
+    return bounds
+
+
+def solve_cluster(
+    algorithm: Type[TreeSpanningAlgorithm],
+    terminal_vertices: List[Vertex],
+    optional_vertices: List[Vertex],
+) -> Tuple[List[Edge], float]:
+    # Module level so it can be sent to the worker processes
+    return algorithm(terminal_vertices, optional_vertices).solve()
+
+
+# Node of the decomposition, a leaf is a cluster that is solved as is and an inner node
+# joins the solutions of its children with the shortest edges between them
+class Decomposition:
+    def __init__(
+        self,
+        terminal_vertices: List[Vertex],
+        optional_vertices: List[Vertex],
+        children: Optional[List['Decomposition']] = None,
+        proven: bool = True,
+    ):
+        self.terminal_vertices = terminal_vertices
+        self.optional_vertices = optional_vertices
+        self.children = children or []
+        # Whether the separation test proved that joining the children keeps the solution optimal
+        self.proven = proven
+
+    def is_leaf(self) -> bool:
+        return not self.children
+
+    def is_exact(self) -> bool:
+        return self.proven and all(child.is_exact() for child in self.children)
+
+    def leaves(self) -> List['Decomposition']:
+        if self.is_leaf():
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+
+class ClusterDecomposition(TreeSpanningAlgorithm):
+    # Splits the terminals into clusters that are far apart from each other, solves every cluster
+    # independently (in parallel when there is more than one worker) and joins the cluster trees
+    # with the shortest edges between them.
+    #
+    # Clusters are made by cutting the longest edges of the minimum spanning tree of the terminals,
+    # every optional vertex follows its closest terminal. Let D be the shortest distance between two
+    # clusters and M the longest spanning tree edge left inside a cluster, which bounds the cost to
+    # reconnect the pieces an optimal tree leaves of a cluster. When D >= M, an optimal tree costs at
+    # least the sum of the optimal cluster trees plus a bound on the edges between the clusters:
+    #  - J, the spanning tree over the contracted clusters using every vertex
+    #  - with the extra cost a_A(u) of making cluster A's tree reach the vertex u where an edge leaves it,
+    #    which can be charged once per cluster and is capped at D: the sum over the m clusters of the
+    #    smallest a_A(u) plus half the distance from u to another cluster, plus (m / 2 - 1) D
+    #  - for two clusters, the shortest edge between them plus a_A and a_B at its ends
+    # When the clusters can be joined through their terminals within that bound, the split keeps the
+    # solution optimal. The finest proven split is used and every cluster is decomposed again.
+    #
+    # When no split can be proven and a cluster has more than max_cluster_terminals terminals, it is
+    # split heuristically at the longest spanning tree edge anyway and the cluster trees are joined with
+    # the shortest edges between them. The result is then a feasible tree that might not be optimal,
+    # which is reported by is_exact. A max_cluster_terminals of None never splits heuristically.
+
+    def __init__(
+        self,
+        terminal_vertices: List[Vertex],
+        optional_vertices: List[Vertex],
+        algorithm: Type[TreeSpanningAlgorithm] = DreyfusWagnerAlgorithm,
+        workers: Optional[int] = None,
+        max_cluster_terminals: Optional[int] = MAX_CLUSTER_TERMINALS,
+    ):
+        super().__init__(terminal_vertices, optional_vertices)
+        self.algorithm = algorithm
+        self.workers = workers
+        self.max_cluster_terminals = max_cluster_terminals
+        self.decomposition = None
+        self._total_cost = 0.0
+
+    def solve(self) -> Tuple[List[Edge], float]:
+
+        # No vertices
+        if not self.terminal_vertices:
+            return [], 0.0
+
+        self.decomposition = self._decompose(self.terminal_vertices, self.optional_vertices)
+        leaves = self.decomposition.leaves()
+
+        arguments = (
+            [self.algorithm] * len(leaves),
+            [leaf.terminal_vertices for leaf in leaves],
+            [leaf.optional_vertices for leaf in leaves],
+        )
+        if self.workers == 1 or len(leaves) == 1:
+            solutions = list(map(solve_cluster, *arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                solutions = list(executor.map(solve_cluster, *arguments))
+
+        edges, self._total_cost, _ = self._stitch(self.decomposition, iter(solutions))
+
+        return edges, self.total_cost()
+
+    def total_cost(self) -> float:
+        return self._total_cost
+
+    def is_exact(self) -> bool:
+        return self.decomposition is None or self.decomposition.is_exact()
+
+    def clusters(self) -> List[List[Vertex]]:
+        if self.decomposition is None:
+            return []
+        return [leaf.terminal_vertices for leaf in self.decomposition.leaves()]
+
+    def _decompose(self, terminal_vertices: List[Vertex], optional_vertices: List[Vertex]) -> Decomposition:
+        if len(terminal_vertices) < 2:
+            return Decomposition(terminal_vertices, optional_vertices)
+
+        tree = spanning_tree(terminal_vertices)
+        tree.sort(key=lambda edge: edge[0], reverse=True)
+        # One distance matrix over every vertex serves every candidate cut
+        distances = distance_matrix(terminal_vertices + optional_vertices)
+        offset = len(terminal_vertices)
+        closest_terminal = distances[offset:, :offset].argmin(axis=1).tolist()
+
+        # Cut as many of the longest edges as possible, the longest remaining edge is the bound M
+        for cut in range(len(tree), 0, -1):
+            clusters, labels = self._partition(terminal_vertices, optional_vertices, tree[cut:], closest_terminal)
+            longest_inside = tree[cut][0] if cut < len(tree) else 0.0
+            if self._is_separated(clusters, labels, distances, longest_inside):
+                return Decomposition(
+                    terminal_vertices,
+                    optional_vertices,
+                    [self._decompose(*cluster) for cluster in clusters],
+                )
+
+        if self.max_cluster_terminals is None or len(terminal_vertices) <= self.max_cluster_terminals:
+            return Decomposition(terminal_vertices, optional_vertices)
+
+        # Heuristic split at the longest edge
+        clusters, _ = self._partition(terminal_vertices, optional_vertices, tree[1:], closest_terminal)
+        return Decomposition(
+            terminal_vertices,
+            optional_vertices,
+            [self._decompose(*cluster) for cluster in clusters],
+            proven=False,
+        )
+
+    def _partition(
+        self,
+        terminal_vertices: List[Vertex],
+        optional_vertices: List[Vertex],
+        kept_edges: List[Tuple[float, int, int]],
+        closest_terminal: List[int],
+    ) -> Tuple[List[Tuple[List[Vertex], List[Vertex]]], numpy.ndarray]:
+        # Label the connected components of the terminals using the kept edges, returns the clusters and the
+        # cluster of every terminal followed by every optional vertex
+        neighbours = [[] for _ in terminal_vertices]
+        for _, i, j in kept_edges:
+            neighbours[i].append(j)
+            neighbours[j].append(i)
+
+        component = [-1] * len(terminal_vertices)
+        clusters = []
+        for start in range(len(terminal_vertices)):
+            if component[start] >= 0:
+                continue
+            component[start] = len(clusters)
+            clusters.append(([], []))
+            stack = [start]
+            while stack:
+                for neighbour in neighbours[stack.pop()]:
+                    if component[neighbour] < 0:
+                        component[neighbour] = component[start]
+                        stack.append(neighbour)
+
+        for vertex, component_index in zip(terminal_vertices, component):
+            clusters[component_index][0].append(vertex)
+        labels = component + [component[terminal_index] for terminal_index in closest_terminal]
+        for vertex, terminal_index in zip(optional_vertices, closest_terminal):
+            clusters[component[terminal_index]][1].append(vertex)
+
+        return clusters, numpy.array(labels, dtype=int)
+
+    def _is_separated(
+        self,
+        clusters: List[Tuple[List[Vertex], List[Vertex]]],
+        labels: numpy.ndarray,
+        distances: numpy.ndarray,
+        longest_inside: float,
+    ) -> bool:
+        offset = len(labels) - sum(len(optional) for _, optional in clusters)
+        to_cluster, between = cluster_distances(distances, labels, len(clusters))
+        shortest_between = float(between[~numpy.eye(len(clusters), dtype=bool)].min())
+        if shortest_between * (1 + EPSILON) < longest_inside:
+            return False
+
+        _, terminal_between = cluster_distances(distances[:offset, :offset], labels[:offset], len(clusters))
+        terminal_join = contracted_tree_cost(terminal_between)
+        if terminal_join <= contracted_tree_cost(between) * (1 + EPSILON):
+            return True
+        return terminal_join <= self._attached_join_bound(
+            clusters, labels, distances, to_cluster, shortest_between,
+        ) * (1 + EPSILON)
+
+    def _attached_join_bound(
+        self,
+        clusters: List[Tuple[List[Vertex], List[Vertex]]],
+        labels: numpy.ndarray,
+        distances: numpy.ndarray,
+        to_cluster: numpy.ndarray,
+        shortest_between: float,
+    ) -> float:
+        # The vertices of every cluster in the order of its terminals followed by its optional vertices
+        members = [numpy.flatnonzero(labels == i) for i in range(len(clusters))]
+        attachments = [numpy.minimum(attachment_bounds(*cluster), shortest_between) for cluster in clusters]
+
+        bound = (len(clusters) / 2 - 1) * shortest_between
+        for i, indices in enumerate(members):
+            outside = to_cluster[indices].copy()
+            outside[:, i] = numpy.inf
+            bound += float((attachments[i] + outside.min(axis=1) / 2).min())
+
+        if len(clusters) == 2:
+            joins = (
+                distances[numpy.ix_(members[0], members[1])] +
+                attachments[0][:, numpy.newaxis] + attachments[1]
+            )
+            bound = max(bound, float(joins.min()))
+
+        return bound
+
+    def _stitch(self, decomposition: Decomposition, solutions) -> Tuple[List[Edge], float, List[Vertex]]:
+        if decomposition.is_leaf():
+            edges, cost = next(solutions)
+            vertices = list(decomposition.terminal_vertices)
+            for e in edges:
+                vertices += [e.v1, e.v2]
+            return edges, cost, vertices
+
+        edges, cost, groups = [], 0.0, []
+        for child in decomposition.children:
+            child_edges, child_cost, child_vertices = self._stitch(child, solutions)
+            edges += child_edges
+            cost += child_cost
+            groups.append(child_vertices)
+
+        # Join the trees of the children with the shortest edges between them
+        for distance, v1, v2 in join_tree(groups):
+            edges.append(Edge(v1, v2))
+            cost += distance
+
+        return edges, cost, [vertex for group in groups for vertex in group]
@@ -0,0 +1,220 @@
+import heapq
+import math
+from typing import Dict, List, Set, Tuple
+
+from algorithms.base_algorithm import TreeSpanningAlgorithm
+from algorithms.minimum_spanning_tree import MinimumSpanningTree
+from graph.graph import Edge, Vertex
+from graph.metrics import distance_matrix
+
+
+# Back pointer kinds stored for every label, used to rebuild the tree
+EDGE = 0
+MERGE = 1
+
+# Relative slack on the upper bound so rounding never prunes an optimal label
+EPSILON = 1e-9
+
+
+class DijkstraSteinerAlgorithm(TreeSpanningAlgorithm):
+    # Label setting exact algorithm by Hougardy, Silvanus and Vygen.
+    # A label (v, I) is the cost of an optimal tree connecting vertex v with the terminal subset I.
+    # Labels are settled in order of their cost plus a lower bound of the cost to connect v to the
+    # remaining terminals, the search stops as soon as the root is connected to every other terminal.
+    # Labels above the pruning bound of _subset_upper_bound are dropped, which keeps uniform random
+    # instances of 30 terminals and 60 optional vertices to a few thousand labels and about a second.
+
+    def __init__(self, terminal_vertices: List[Vertex], optional_vertices: List[Vertex]):
+        super().__init__(terminal_vertices, optional_vertices)
+        self.vertices = self.terminal_vertices + self.optional_vertices
+        self.distances = []
+        self.labels: Dict[Tuple[int, int], float] = dict()
+        self.back_pointers: Dict[Tuple[int, int], Tuple[int, int]] = dict()
+        self.settled: Set[Tuple[int, int]] = set()
+        self.settled_at: List[List[int]] = []
+        self.steiner_edges = []
+        self._total_cost = 0.0
+        self._mst_cache: Dict[int, float] = dict()
+        self._bound_cache: Dict[Tuple[int, int], float] = dict()
+        self._prune_cache: Dict[int, Tuple[float, float]] = dict()
+        self._upper_bound = math.inf
+
+    def solve(self) -> Tuple[List[Edge], float]:
+
+        # No vertices
+        if not self.terminal_vertices:
+            return [], 0.0
+
+        # No optional vertices, solve as a minimum spanning tree
+        if not self.optional_vertices:
+            return MinimumSpanningTree(self.terminal_vertices).solve()
+
+        terminal_count = len(self.terminal_vertices)
+        if terminal_count == 1:
+            return [], 0.0
+
+        self.distances = distance_matrix(self.vertices).tolist()
+        self.settled_at = [[] for _ in self.vertices]
+
+        # The first terminal is the root, every other terminal has a bit in the label subsets
+        all_terminals = (1 << terminal_count) - 1
+        target = all_terminals ^ 1
+
+        # The spanning tree over the terminals is a feasible solution, no label above its cost is ever needed
+        self._upper_bound = self._terminal_mst(all_terminals) * (1 + EPSILON)
+
+        heap = []
+        for index in range(1, terminal_count):
+            self.labels[(index, 1 << index)] = 0.0
+            heapq.heappush(heap, (self._lower_bound(index, 1 << index), 0.0, index, 1 << index))
+
+        while heap:
+            _, cost, vertex, subset = heapq.heappop(heap)
+
+            key = (vertex, subset)
+            if key in self.settled or cost > self.labels[key]:
+                continue  # Stale heap entry
+
+            self.settled.add(key)
+            self.settled_at[vertex].append(subset)
+
+            if vertex == 0 and subset == target:
+                break
+
+            # Grow the tree along an edge. The graph is complete and metric, so a label that was itself
+            # reached along an edge never offers a shorter path than the label it was reached from.
+            if self.back_pointers.get(key, (MERGE, 0))[0] != EDGE:
+                for neighbour, distance in enumerate(self.distances[vertex]):
+                    if neighbour == vertex:
+                        continue
+                    self._update(heap, neighbour, subset, cost + distance, (EDGE, vertex))
+
+            # Merge with every settled disjoint subset at the same vertex
+            for other_subset in self._disjoint_settled(vertex, target ^ subset):
+                merged_cost = cost + self.labels[(vertex, other_subset)]
+                if merged_cost > self._upper_bound:
+                    continue
+                self._update(heap, vertex, subset | other_subset, merged_cost, (MERGE, other_subset))
+
+        self._total_cost = self.labels[(0, target)]
+        edges = set()
+        self._build_solution(0, target, edges)
+        self.steiner_edges = [Edge(self.vertices[a], self.vertices[b]) for a, b in sorted(edges)]
+
+        return self.steiner_edges, self.total_cost()
+
+    def total_cost(self) -> float:
+        return self._total_cost
+
+    def _update(self, heap, vertex: int, subset: int, cost: float, back_pointer: Tuple[int, int]) -> None:
+        key = (vertex, subset)
+        if key in self.settled or cost >= self.labels.get(key, math.inf):
+            return
+
+        estimate = cost + self._lower_bound(vertex, subset)
+        if estimate > self._upper_bound or cost > self._subset_upper_bound(vertex, subset) * (1 + EPSILON):
+            return
+
+        self.labels[key] = cost
+        self.back_pointers[key] = back_pointer
+        heapq.heappush(heap, (estimate, cost, vertex, subset))
+
+    def _disjoint_settled(self, vertex: int, complement: int):
+        settled_at = self.settled_at[vertex]
+
+        # Scan the settled labels of the vertex when there are fewer of them than subsets of the complement
+        if len(settled_at) < 1 << bin(complement).count('1'):
+            for other_subset in settled_at:
+                if not other_subset & ~complement:
+                    yield other_subset
+            return
+
+        # Otherwise enumerate every non-empty subset of the complement
+        other_subset = complement
+        while other_subset:
+            if (vertex, other_subset) in self.settled:
+                yield other_subset
+            other_subset = (other_subset - 1) & complement
+
+    def _lower_bound(self, vertex: int, subset: int) -> float:
+        existing = self._bound_cache.get((vertex, subset), None)
+        if existing is None:
+            existing = self._bound_cache[(vertex, subset)] = self._compute_lower_bound(vertex, subset)
+        return existing
+
+    def _compute_lower_bound(self, vertex: int, subset: int) -> float:
+        # The terminals not yet in the subset, the root is always one of them
+        remaining = ((1 << len(self.terminal_vertices)) - 1) ^ subset
+
+        # Two closest remaining terminals and the farthest remaining terminal
+        closest = second = math.inf
+        farthest = 0.0
+        for index in range(len(self.terminal_vertices)):
+            if not remaining >> index & 1:
+                continue
+            distance = self.distances[vertex][index]
+            if distance < closest:
+                closest, second = distance, closest
+            elif distance < second:
+                second = distance
+            farthest = max(farthest, distance)
+
+        if second == math.inf:  # Only the root remains
+            return closest
+
+        # 1-tree bound, half of a tree over the remaining terminals plus the two edges to the vertex
+        one_tree = (self._terminal_mst(remaining) + closest + second) / 2
+        return max(one_tree, farthest)
+
+    def _subset_upper_bound(self, vertex: int, subset: int) -> float:
+        # Pruning test of Hougardy, Silvanus and Vygen. In an optimal tree the part below the label (v, I) can
+        # be replaced by a spanning tree over I plus the shortest edge from I to the rest of the tree, which
+        # holds v and every terminal outside I. A label above that cost is never part of an optimal tree.
+        cached = self._prune_cache.get(subset, None)
+        if cached is None:
+            terminal_count = len(self.terminal_vertices)
+            inside = [i for i in range(terminal_count) if subset >> i & 1]
+            outside = [i for i in range(terminal_count) if not subset >> i & 1]
+            cached = self._prune_cache[subset] = (
+                self._terminal_mst(subset),
+                min(self.distances[i][j] for i in inside for j in outside),
+            )
+
+        spanning_tree, closest_outside = cached
+        if closest_outside == 0.0:
+            return spanning_tree
+        closest_vertex = min(self.distances[vertex][i] for i in range(len(self.terminal_vertices)) if subset >> i & 1)
+        return spanning_tree + min(closest_outside, closest_vertex)
+
+    def _terminal_mst(self, terminals: int) -> float:
+        existing = self._mst_cache.get(terminals, None)
+        if existing is not None:
+            return existing
+
+        # Prim's algorithm on the dense distance matrix of the given terminals
+        indices = [i for i in range(len(self.terminal_vertices)) if terminals >> i & 1]
+        best = {i: self.distances[indices[0]][i] for i in indices[1:]}
+        total = 0.0
+        while best:
+            next_index = min(best, key=best.get)
+            total += best.pop(next_index)
+            for i in best:
+                best[i] = min(best[i], self.distances[next_index][i])
+
+        self._mst_cache[terminals] = total
+        return total
+
+    def _build_solution(self, vertex: int, subset: int, edges: set) -> None:
+        back_pointer = self.back_pointers.get((vertex, subset), None)
+        if back_pointer is None:  # A terminal label of cost zero
+            return
+
+        kind, value = back_pointer
+        if kind == EDGE:
+            if self.distances[vertex][value] > 0:
+                edges.add((min(vertex, value), max(vertex, value)))
+            self._build_solution(value, subset, edges)
+            return
+
+        self._build_solution(vertex, value, edges)
+        self._build_solution(vertex, subset ^ value, edges)
@@ -1,9 +1,11 @@
 from bitarray import bitarray
-from typing import List, Tuple
+from itertools import combinations
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 from algorithms.base_algorithm import TreeSpanningAlgorithm
 from algorithms.minimum_spanning_tree import MinimumSpanningTree
 from graph.graph import Edge, Vertex
+from graph.metrics import distance_matrix
 
 
 # A class used in a map to save search states during the algorithm
@@ -26,13 +28,20 @@ class SearchState:
 class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
 
     def __init__(self, terminal_vertices: List[Vertex], optional_vertices: List[Vertex]):
-        super().__init__(terminal_vertices, optional_vertices)
+        # Vertices at the same position are the same vertex, keep only one of them
+        terminal_vertices = list(dict.fromkeys(terminal_vertices))
+        super().__init__(terminal_vertices, [])
+        self.optional_vertices = self._unknown_vertices(optional_vertices)
         self.split_map = dict()
         self.candidate_map = dict()
         self._total_cost = 0.0
         self.steiner_edges = []
         self.steiner_vertices = []
         self.terminal_to_index = dict()
+        # Distances between the terminals followed by the optional vertices, computed by the batch kernel of
+        # their metric whenever the vertices change
+        self.distances: List[List[float]] = []
+        self.vertex_to_index: Dict[Vertex, int] = dict()
 
     def solve(self) -> Tuple[List[Edge], float]:
 
@@ -47,21 +56,262 @@ class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
         remaining = bitarray(len(self.terminal_vertices))
         remaining.setall(True)
 
-        # Create a mapping of a terminal vertex to its index in the list
-        for i in range(len(self.terminal_vertices)):
-            self.terminal_to_index[self.terminal_vertices[i]] = i
+        self._index_terminals()
 
         # Start at the first terminal
         remaining[0] = False
 
+        # Labels left from an earlier solve are reused
         self._total_cost = self._connect_vertex(self.terminal_vertices[0], remaining)
-        self._build_solution_connect(self.terminal_vertices[0], remaining)
+        self.steiner_edges = self._build_solution_connect(self.terminal_vertices[0], remaining, dict())
+        self.steiner_vertices = [
+            vertex for vertex in dict.fromkeys(e.v2 for e in self.steiner_edges)
+            if vertex not in self.terminal_to_index
+        ]
 
         return self.steiner_edges, self.total_cost()
 
     def total_cost(self) -> float:
         return self._total_cost
 
+    def cost_for(self, subset: List[Vertex]) -> float:
+        # Cost of the optimal tree spanning a subset of the terminals
+        root, remaining = self._query_state(subset)
+        if root is None:
+            return 0.0
+        if not self.optional_vertices:
+            return MinimumSpanningTree(list(dict.fromkeys(subset))).solve()[1]
+        return self._connect_vertex(root, remaining)
+
+    def tree_for(self, subset: List[Vertex]) -> List[Edge]:
+        # Edges of the optimal tree spanning a subset of the terminals
+        return self.trees_for([subset])[0][0]
+
+    def trees_for(self, subsets: List[List[Vertex]]) -> List[Tuple[List[Edge], float]]:
+        # Optimal trees for several subsets of the terminals. The labels computed by solve are reused,
+        # labels missing for a subset are computed once and kept for the following queries. Sub-trees
+        # shared between the queries are only reconstructed once, every query gets its own list of them.
+        built: Dict[Tuple[bool, SearchState], List[Edge]] = dict()
+        trees = []
+        for subset in subsets:
+            root, remaining = self._query_state(subset)
+            if root is None:
+                trees.append(([], 0.0))
+            elif not self.optional_vertices:
+                trees.append(MinimumSpanningTree(list(dict.fromkeys(subset))).solve())
+            else:
+                cost = self._connect_vertex(root, remaining)
+                trees.append((list(self._build_solution_connect(root, remaining, built)), cost))
+        return trees
+
+    def _index_terminals(self) -> None:
+        # Create a mapping of a terminal vertex to its index in the list
+        for i in range(len(self.terminal_vertices)):
+            self.terminal_to_index[self.terminal_vertices[i]] = i
+
+        if not self.distances:
+            vertices = self.terminal_vertices + self.optional_vertices
+            self.distances = distance_matrix(vertices).tolist()
+            # An optional vertex at the position of a terminal shares its distances
+            self.vertex_to_index = dict()
+            for i, vertex in enumerate(vertices):
+                self.vertex_to_index.setdefault(vertex, i)
+
+    def _query_state(self, subset: List[Vertex]) -> Tuple[Optional[Vertex], bitarray]:
+        # The label answering a query: the tree is rooted at the first terminal of the subset, which is the
+        # root of the full solve whenever the subset contains it
+        self._index_terminals()
+
+        remaining = bitarray(len(self.terminal_vertices))
+        remaining.setall(False)
+        for vertex in subset:
+            index = self.terminal_to_index.get(vertex, None)
+            if index is None:
+                raise ValueError(f'{vertex} is not a terminal vertex')
+            remaining[index] = True
+
+        if remaining.count() < 2:
+            return None, remaining
+
+        root_index = remaining.index(True)
+        remaining[root_index] = False
+        return self.terminal_vertices[root_index], remaining
+
+    def add_optional_vertices(self, vertices: List[Vertex]) -> None:
+        added = self._unknown_vertices(vertices)
+        self.optional_vertices = self.optional_vertices + added
+        self.distances = []  # Computed again for the new vertices
+
+        if not self.candidate_map or not added:  # Nothing solved yet, the next solve starts from scratch
+            return
+        self._index_terminals()
+
+        # Labels only get cheaper when a vertex is added. Going from small to large subsets, the labels of
+        # the new vertices are computed and the other labels are only recomputed from the labels that got
+        # cheaper. Labels that are missing, for example dropped by a removal, are computed from scratch.
+        changed_connect: Dict[Vertex, Set[int]] = dict()
+        for remaining in self._subsets_by_size():
+            mask = int(remaining.to01(), 2)
+            vertices = self._vertices_outside(remaining)
+
+            changed_split: Set[Vertex] = set()
+            if remaining.count() > 1:
+                for vertex in vertices:
+                    if SearchState(vertex, remaining) not in self.split_map:
+                        self._split_vertex(vertex, remaining)
+                    elif not self._repair_split(vertex, remaining, changed_connect.get(vertex, set())):
+                        continue
+                    changed_split.add(vertex)
+
+            for vertex in vertices:
+                if SearchState(vertex, remaining) not in self.candidate_map:
+                    self._connect_vertex(vertex, remaining)
+                elif not self._repair_connect(vertex, remaining, changed_split, changed_connect):
+                    continue
+                changed_connect.setdefault(vertex, set()).add(mask)
+
+    def remove_optional_vertices(self, vertices: List[Vertex]) -> None:
+        removed = set(vertices)
+        self.optional_vertices = [vertex for vertex in self.optional_vertices if vertex not in removed]
+        self.distances = []
+
+        if not self.candidate_map:  # Nothing solved yet
+            return
+
+        # Labels that do not use a removed vertex are still optimal, the others are dropped
+        # and computed again by the next solve
+        invalid: Set[SearchState] = set()
+        for remaining in self._subsets_by_size():
+            vertices = self._vertices_outside(remaining) + list(removed)
+
+            for vertex in vertices:
+                key = SearchState(vertex, remaining)
+                split = self.split_map.get(key, None)
+                if split is not None and (
+                    vertex in removed or
+                    SearchState(vertex, split[1]) in invalid or
+                    SearchState(vertex, remaining ^ split[1]) in invalid
+                ):
+                    del self.split_map[key]
+                    invalid.add(key)
+
+            for vertex in vertices:
+                key = SearchState(vertex, remaining)
+                candidate = self.candidate_map.get(key, None)
+                if candidate is not None and (
+                    vertex in removed or
+                    self._connect_depends_on(vertex, remaining, candidate[1], removed, invalid)
+                ):
+                    del self.candidate_map[key]
+                    invalid.add(key)
+
+    def _unknown_vertices(self, vertices: List[Vertex]) -> List[Vertex]:
+        # Optional vertices at the position of a terminal are kept, a query for a subset of the terminals
+        # without that terminal can still split there
+        known = set(self.optional_vertices)
+        return [vertex for vertex in dict.fromkeys(vertices) if vertex not in known]
+
+    def _subsets_by_size(self) -> Iterator[bitarray]:
+        # Every non-empty subset of the terminals except the first one, smallest first
+        for size in range(1, len(self.terminal_vertices)):
+            for indices in combinations(range(1, len(self.terminal_vertices)), size):
+                remaining = bitarray(len(self.terminal_vertices))
+                remaining.setall(False)
+                for index in indices:
+                    remaining[index] = True
+                yield remaining
+
+    def _vertices_outside(self, remaining: bitarray) -> List[Vertex]:
+        # The vertices that can have a label for the remaining terminals
+        return [
+            vertex for vertex in self.terminal_vertices + self.optional_vertices
+            if vertex not in self.terminal_to_index or not remaining[self.terminal_to_index[vertex]]
+        ]
+
+    def _repair_split(self, vertex: Vertex, remaining: bitarray, changed_connect: Set[int]) -> bool:
+        # The split can only get cheaper if a label of the vertex over a part of the subset got cheaper
+        mask = int(remaining.to01(), 2)
+        key = SearchState(vertex, remaining)
+        best_distance, best_subset = self.split_map[key]
+
+        # Only the splits where one of the parts got cheaper
+        for changed in changed_connect:
+            if changed & ~mask or changed == mask:
+                continue
+            subset = bitarray(format(changed, f'0{len(remaining)}b'))
+            distance = self._connect_vertex(vertex, subset) + self._connect_vertex(vertex, remaining ^ subset)
+            if distance < best_distance:
+                best_distance, best_subset = distance, subset
+
+        if best_distance < self.split_map[key][0]:
+            self.split_map[key] = (best_distance, best_subset)
+            return True
+        return False
+
+    def _repair_connect(
+        self,
+        vertex: Vertex,
+        remaining: bitarray,
+        changed_split: Set[Vertex],
+        changed_connect: Dict[Vertex, Set[int]],
+    ) -> bool:
+        key = SearchState(vertex, remaining)
+        best_distance, candidate = self.candidate_map[key]
+        distances = self.distances[self.vertex_to_index[vertex]]
+
+        # Splits that got cheaper, at the vertex itself or at an optional vertex
+        for split_vertex in changed_split:
+            if (
+                split_vertex != vertex and
+                split_vertex in self.terminal_to_index and
+                split_vertex not in self.optional_vertices
+            ):
+                continue
+            distance = (
+                self.split_map[SearchState(split_vertex, remaining)][0] +
+                distances[self.vertex_to_index[split_vertex]]
+            )
+            if distance < best_distance:
+                best_distance, candidate = distance, split_vertex
+
+        # Terminals that got cheaper to connect with the rest of the subset
+        for terminal, index in self.terminal_to_index.items():
+            if not remaining[index]:
+                continue
+            remaining[index] = False
+            if int(remaining.to01(), 2) in changed_connect.get(terminal, set()):
+                distance = self.candidate_map[SearchState(terminal, remaining)][0] + distances[index]
+                if distance < best_distance:
+                    best_distance, candidate = distance, terminal
+            remaining[index] = True
+
+        if best_distance < self.candidate_map[key][0]:
+            self.candidate_map[key] = (best_distance, candidate)
+            return True
+        return False
+
+    def _connect_depends_on(
+        self,
+        vertex: Vertex,
+        remaining: bitarray,
+        candidate: Vertex,
+        removed: Set[Vertex],
+        invalid: Set[SearchState],
+    ) -> bool:
+        if remaining.count() == 1:  # Connected directly to the last terminal
+            return False
+        if candidate in removed:
+            return True
+
+        terminal_index = self.terminal_to_index.get(candidate, None)
+        if candidate == vertex or terminal_index is None:
+            # Split at the vertex itself or at an optional vertex
+            return SearchState(candidate, remaining) in invalid
+
+        rest = bitarray(remaining)
+        rest[terminal_index] = False
+        return SearchState(candidate, rest) in invalid
+
     def _connect_vertex(self, vertex: Vertex, remaining_terminals: bitarray) -> float:
 
         # Copy the remaining terminals
@@ -77,7 +327,7 @@ class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
             index = remaining.index(True)
 
             # Look up distance between the remaining terminal and the current vertex
-            distance = vertex.distance_to(self.terminal_vertices[index])
+            distance = self.distances[self.vertex_to_index[vertex]][index]
 
             # Add tuple of distance and the remaining vertex to the candidate map
             self.candidate_map[SearchState(vertex, remaining)] = (
@@ -95,11 +345,16 @@ class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
 
         best_split_distance = self._split_vertex(vertex, remaining)
         candidate = vertex
+        distances = self.distances[self.vertex_to_index[vertex]]
+        offset = len(self.terminal_vertices)
 
         # Check every grid vertex if they can offer a better split
-        for optional_vertex in self.optional_vertices:
+        for i, optional_vertex in enumerate(self.optional_vertices):
+            index = self.terminal_to_index.get(optional_vertex, None)
+            if (index is not None and remaining[index]):  # Connecting the terminal there is never worse
+                continue
             distance = self._split_vertex(optional_vertex, remaining)
-            distance += vertex.distance_to(optional_vertex)
+            distance += distances[offset + i]
             if (best_split_distance < 0 or distance < best_split_distance):
                 # Found a better split
                 best_split_distance = distance
@@ -113,7 +368,7 @@ class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
             # Recursive call
             distance = self._connect_vertex(vert, remaining)
 
-            distance += vertex.distance_to(vert)
+            distance += distances[index]
             remaining[index] = True  # Set  it back
 
             if (best_split_distance < 0 or distance < best_split_distance):
@@ -185,42 +440,62 @@ class DreyfusWagnerAlgorithm(TreeSpanningAlgorithm):
 
         return result1
 
-    def _build_solution_connect(self, vertex: Vertex, remaining_terminals: bitarray) -> None:
+    def _build_solution_connect(
+        self,
+        vertex: Vertex,
+        remaining_terminals: bitarray,
+        built: Dict[Tuple[bool, SearchState], List[Edge]],
+    ) -> List[Edge]:
         # Copy the remaining terminals
         remaining = bitarray(remaining_terminals)
 
         if (not remaining.any()):  # No terminals remaining
-            return
+            return []
+
+        # Sub-trees that were already built for another query
+        key = (False, SearchState(vertex, remaining))
+        if key in built:
+            return built[key]
 
         next_vertex = self.candidate_map[SearchState(vertex, remaining)][1]
+        index = self.terminal_to_index.get(next_vertex, None)
 
         if (vertex == next_vertex):
-            self._build_solution_split(next_vertex, remaining)
-            return
-
-        terminal_index = self.terminal_to_index.get(next_vertex, None)
-        if (terminal_index is None):
-            # Add the non-terminal vertex to the list of steiner vertices
-            self.steiner_vertices += [next_vertex]
-            # Add the edge from vertex to nextVertex to the list of edges
-            self.steiner_edges.append(Edge(vertex, next_vertex))
-            self._build_solution_split(next_vertex, remaining)
-            return
-        # Add the edge from vertex to the terminal vertex to the list of edges
-        self.steiner_edges.append(Edge(vertex, next_vertex))
-
-        # Flip the bit at terminalIndex
-        remaining[terminal_index] = not remaining[terminal_index]
-        self._build_solution_connect(next_vertex, remaining)
-
-    def _build_solution_split(self, vertex: Vertex, remaining_terminals: bitarray) -> None:
+            edges = self._build_solution_split(next_vertex, remaining, built)
+        elif (index is None or not remaining[index]):
+            # Edge to an optional vertex, which splits the remaining terminals
+            edges = [Edge(vertex, next_vertex)] + self._build_solution_split(next_vertex, remaining, built)
+        else:
+            # Edge to the terminal vertex, flip the bit at its index in a copy as the key holds the original
+            rest = bitarray(remaining)
+            rest[index] = False
+            edges = [Edge(vertex, next_vertex)] + self._build_solution_connect(next_vertex, rest, built)
+
+        built[key] = edges
+        return edges
+
+    def _build_solution_split(
+        self,
+        vertex: Vertex,
+        remaining_terminals: bitarray,
+        built: Dict[Tuple[bool, SearchState], List[Edge]],
+    ) -> List[Edge]:
         # Copy the remaining terminals
         remaining = bitarray(remaining_terminals)
 
         if (not remaining.any()):  # No terminals remaining
-            return
+            return []
+
+        key = (True, SearchState(vertex, remaining))
+        if key in built:
+            return built[key]
 
         # Find the subset that was used when splitting
         split_subset = self.split_map[SearchState(vertex, remaining)][1]
-        self._build_solution_connect(vertex, split_subset)
-        self._build_solution_connect(vertex, remaining ^ split_subset)
+        edges = (
+            self._build_solution_connect(vertex, split_subset, built) +
+            self._build_solution_connect(vertex, remaining ^ split_subset, built)
+        )
+
+        built[key] = edges
+        return edges
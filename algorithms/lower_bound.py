@@ -0,0 +1,206 @@
+import math
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from algorithms.base_algorithm import TreeSpanningAlgorithm
+from algorithms.minimum_spanning_tree import MinimumSpanningTree
+from graph.graph import Edge, Vertex
+from graph.metrics import distance_matrix
+
+
+# Absolute tolerance when comparing a bound with an upper bound
+TOLERANCE = 1e-9
+
+
+def optimality_gap(total_cost: float, lower_bound: float) -> float:
+    # Relative distance between a solution and a lower bound, 0 means the solution is proven optimal
+    if total_cost <= 0.0:
+        return 0.0
+    return max(total_cost - lower_bound, 0.0) / total_cost
+
+
+def bound_and_gap(
+    total_cost: float,
+    terminal_vertices: List[Vertex],
+    optional_vertices: List[Vertex],
+) -> Tuple[float, float]:
+    # The dual ascent lower bound of the instance and the optimality gap of a solution of the given cost
+    lower_bound = float(DualAscent(terminal_vertices, optional_vertices).solve())
+    return lower_bound, optimality_gap(total_cost, lower_bound)
+
+
+def solve_with_bound(
+    algorithm: TreeSpanningAlgorithm,
+    terminal_vertices: List[Vertex],
+    optional_vertices: List[Vertex],
+) -> Tuple[List[Edge], float, float, float]:
+    # Solves and returns the edges and total cost together with the lower bound of the instance and the
+    # optimality gap of the solution. The instance is given explicitly as some algorithms, like the minimum
+    # spanning tree, do not keep the optional vertices they were given.
+    edges, total_cost = algorithm.solve()
+    return (edges, total_cost) + bound_and_gap(total_cost, terminal_vertices, optional_vertices)
+
+
+def shortest_distances(costs: numpy.ndarray, sources: List[int]) -> numpy.ndarray:
+    # Dijkstra on a dense cost matrix, costs[i, j] is the cost of the arc from i to j
+    distances = numpy.full(len(costs), math.inf)
+    distances[sources] = 0.0
+    done = numpy.zeros(len(costs), dtype=bool)
+    for _ in range(len(costs)):
+        vertex = int(numpy.argmin(numpy.where(done, math.inf, distances)))
+        if done[vertex] or distances[vertex] == math.inf:
+            break
+        done[vertex] = True
+        numpy.minimum(distances, distances[vertex] + costs[vertex], out=distances)
+    return distances
+
+
+class DualAscent:
+    # Wong's dual ascent on the bidirected complete graph over the terminals and the optional vertices,
+    # rooted at the first terminal. As long as some terminal can not be reached from the root along arcs
+    # of reduced cost zero, the set W of vertices that reach it along such arcs is a cut every Steiner
+    # arborescence has to enter. The cheapest arc into W is added to the lower bound and subtracted from
+    # every arc into W.
+    #
+    # The reduced costs left at the end bound the extra cost of using a vertex: any tree containing an
+    # optional vertex v costs at least the lower bound plus the reduced distance from the root to v and
+    # from v to the closest terminal.
+
+    def __init__(self, terminal_vertices: List[Vertex], optional_vertices: List[Vertex]):
+        self.terminal_vertices = terminal_vertices
+        self.optional_vertices = optional_vertices
+        self.vertices = self.terminal_vertices + self.optional_vertices
+        self.reduced_costs = numpy.zeros((len(self.vertices), len(self.vertices)))
+        self.lower_bound = 0.0
+
+    def solve(self) -> float:
+        if len(self.terminal_vertices) < 2:
+            return self.lower_bound
+
+        # Without optional vertices the spanning tree of the terminals is optimal, there is nothing to ascend
+        if not self.optional_vertices:
+            self.lower_bound = MinimumSpanningTree(self.terminal_vertices).solve()[1]
+            return self.lower_bound
+
+        self.reduced_costs = distance_matrix(self.vertices)
+        return self._ascend()
+
+    def root_distances(self) -> numpy.ndarray:
+        return shortest_distances(self.reduced_costs, [0])
+
+    def terminal_distances(self) -> numpy.ndarray:
+        # Distances to the closest terminal, found from the terminals along the reversed arcs
+        return shortest_distances(self.reduced_costs.T, list(range(len(self.terminal_vertices))))
+
+    def eliminated_vertices(self, upper_bound: float) -> List[Vertex]:
+        # The optional vertices that are in no tree cheaper than the upper bound
+        if len(self.terminal_vertices) < 2:
+            return list(self.optional_vertices)
+
+        bounds = self.lower_bound + self.root_distances() + self.terminal_distances()
+        offset = len(self.terminal_vertices)
+        return [
+            vertex for i, vertex in enumerate(self.optional_vertices)
+            if bounds[offset + i] > upper_bound + TOLERANCE
+        ]
+
+    def fixed_vertices(self, upper_bound: float) -> List[Vertex]:
+        # The optional vertices that are in every tree cheaper than the upper bound, without them the lower
+        # bound is above the upper bound. The spanning tree of the terminals uses none of them, so nothing
+        # is fixed when it is not above the upper bound. Expects the ascent to be solved.
+        if len(self.terminal_vertices) < 2 or MinimumSpanningTree(self.terminal_vertices).solve()[1] <= upper_bound:
+            return []
+
+        offset = len(self.terminal_vertices)
+        return [
+            vertex for i, vertex in enumerate(self.optional_vertices)
+            if self._without(offset + i).lower_bound > upper_bound + TOLERANCE
+        ]
+
+    def _ascend(self) -> float:
+        # Raises the lower bound from the current reduced costs until every terminal is reached from the root.
+        # Reduced costs only go down, so the cut of a terminal only grows. It is kept between the steps of the
+        # terminal and grown only through the arcs that dropped to zero since its last step.
+        root = 0
+        zero_tails: List[int] = []  # Arcs that dropped to zero, in the order of the steps
+        zero_heads: List[int] = []
+        cuts: Dict[int, Tuple[numpy.ndarray, int]] = dict()
+        active = deque(range(1, len(self.terminal_vertices)))
+        while active:
+            terminal = active.popleft()
+            if terminal in cuts:
+                cut, seen = cuts[terminal]
+                tails = numpy.array(zero_tails[seen:], dtype=int)
+                heads = numpy.array(zero_heads[seen:], dtype=int)
+                cut = self._grow(cut, numpy.unique(tails[cut[heads] & ~cut[tails]]))
+            else:
+                cut = self._grow(numpy.zeros(len(self.vertices), dtype=bool), [terminal])
+            if cut[root]:
+                continue  # Connected to the root, never becomes active again
+
+            outside = numpy.flatnonzero(~cut)
+            inside = numpy.flatnonzero(cut)
+            entering = numpy.ix_(outside, inside)
+            costs = self.reduced_costs[entering]
+            delta = costs.min()
+            costs -= delta
+            self.reduced_costs[entering] = costs
+            self.lower_bound += delta
+
+            cuts[terminal] = (cut, len(zero_tails))
+            rows, columns = numpy.nonzero(costs <= 0.0)
+            zero_tails.extend(outside[rows].tolist())
+            zero_heads.extend(inside[columns].tolist())
+            active.append(terminal)
+
+        return self.lower_bound
+
+    def _without(self, index: int) -> 'DualAscent':
+        # The ascent of the instance without an optional vertex, continued from the reduced costs left here.
+        # Every arc into a cut of the smaller graph also enters the cut with the vertex, so the reduced costs
+        # stay non negative and the bound reached so far still holds.
+        offset = len(self.terminal_vertices)
+        dual_ascent = DualAscent(
+            self.terminal_vertices,
+            self.optional_vertices[:index - offset] + self.optional_vertices[index - offset + 1:],
+        )
+        dual_ascent.reduced_costs = numpy.delete(numpy.delete(self.reduced_costs, index, axis=0), index, axis=1)
+        dual_ascent.lower_bound = self.lower_bound
+        dual_ascent._ascend()
+        return dual_ascent
+
+    def _grow(self, cut: numpy.ndarray, reached: List[int]) -> numpy.ndarray:
+        # Adds the reached vertices to the cut, and every vertex that reaches them along arcs of reduced cost
+        # zero, only looking at the arcs into the vertices added last
+        frontier = numpy.asarray(reached, dtype=int)
+        while len(frontier):
+            cut[frontier] = True
+            frontier = numpy.flatnonzero(~cut & (self.reduced_costs[:, frontier] <= 0.0).any(axis=1))
+        return cut
+
+
+def reduce_vertices(
+    terminal_vertices: List[Vertex],
+    optional_vertices: List[Vertex],
+    upper_bound: Optional[float] = None,
+) -> Tuple[List[Vertex], List[Vertex]]:
+    # Removes the optional vertices that are in no optimal tree and turns the ones that are in every
+    # optimal tree into terminals. The spanning tree of the terminals is used when no upper bound is given.
+    if upper_bound is None:
+        upper_bound = MinimumSpanningTree(terminal_vertices).solve()[1]
+
+    dual_ascent = DualAscent(terminal_vertices, optional_vertices)
+    dual_ascent.solve()
+    eliminated = {id(vertex) for vertex in dual_ascent.eliminated_vertices(upper_bound)}
+    remaining = [vertex for vertex in optional_vertices if id(vertex) not in eliminated]
+
+    reduced = DualAscent(terminal_vertices, remaining)
+    reduced.solve()
+    fixed = reduced.fixed_vertices(upper_bound)
+    fixed_ids = {id(vertex) for vertex in fixed}
+    return (
+        terminal_vertices + fixed,
+        [vertex for vertex in remaining if id(vertex) not in fixed_ids],
+    )
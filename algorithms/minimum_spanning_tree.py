@@ -3,6 +3,7 @@ from typing import List, Tuple
 
 from algorithms.base_algorithm import TreeSpanningAlgorithm
 from graph.graph import Edge, Vertex
+from graph.metrics import distances_from
 
 
 class MinimumSpanningTree(TreeSpanningAlgorithm):
@@ -12,6 +13,7 @@ class MinimumSpanningTree(TreeSpanningAlgorithm):
         super().__init__(terminal_vertices, [])
         self.edges = []
         self.heap_priorty_q = []
+        self.pushed = 0
         self.start_vertex = self.terminal_vertices[0] if terminal_vertices else None
 
     def solve(self) -> Tuple[List[Edge], float]:
@@ -25,7 +27,7 @@ class MinimumSpanningTree(TreeSpanningAlgorithm):
         visited.add(self.start_vertex)
 
         while len(self.heap_priorty_q) > 0 and len(visited) != len(self.terminal_vertices):
-            next_edge = heapq.heappop(self.heap_priorty_q)
+            _, _, next_edge = heapq.heappop(self.heap_priorty_q)
 
             # Skip any visited vertices
             if (next_edge.v2 in visited):
@@ -46,7 +48,10 @@ class MinimumSpanningTree(TreeSpanningAlgorithm):
         return sum(e.distance() for e in self.edges)
 
     def _add_every_edge(self, from_vertex):
-        for vertex in self.terminal_vertices:
+        # The heap holds (distance, push order, edge), the distances come from the batch kernel of the metric
+        distances = distances_from(from_vertex, self.terminal_vertices).tolist()
+        for vertex, distance in zip(self.terminal_vertices, distances):
             if (vertex != from_vertex):
                 e = Edge(from_vertex, vertex)
-                heapq.heappush(self.heap_priorty_q, e)
+                heapq.heappush(self.heap_priorty_q, (distance, self.pushed, e))
+                self.pushed += 1
@@ -0,0 +1,135 @@
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from algorithms.base_algorithm import TreeSpanningAlgorithm
+from graph.graph import Edge
+
+
+# Seconds between two stack samples
+SAMPLE_INTERVAL = 0.001
+
+# Functions that start a phase of an algorithm, a function belongs to the innermost phase on its stack
+PHASES = {
+    'dreyfus_wagner._connect_vertex': 'connect',
+    'dreyfus_wagner._split_vertex': 'split',
+    'dreyfus_wagner._build_solution_connect': 'reconstruction',
+    'dreyfus_wagner._build_solution_split': 'reconstruction',
+    'dreyfus_wagner.add_optional_vertices': 'update',
+    'dreyfus_wagner.remove_optional_vertices': 'update',
+    'dijkstra_steiner._update': 'labels',
+    'dijkstra_steiner._disjoint_settled': 'merge',
+    'dijkstra_steiner._lower_bound': 'lower bound',
+    'dijkstra_steiner._build_solution': 'reconstruction',
+    'cluster_decomposition._decompose': 'decomposition',
+    'cluster_decomposition._stitch': 'stitching',
+    'minimum_spanning_tree.solve': 'spanning tree',
+    'brute_force_mst.solve': 'brute force',
+    'lower_bound.solve': 'lower bound',
+    'lower_bound.reduce_vertices': 'reduction',
+}
+
+# Functions called from every phase, labelled with the phase they were called from
+HOT_FUNCTIONS = {
+    'dreyfus_wagner._best_split',
+    'graph.__lt__',
+    'graph.distance',
+    'graph.distance_to',
+    'graph.eculidean_distance',
+    'metrics.distance_matrix',
+    'metrics.distances_from',
+}
+
+
+def frame_name(frame) -> str:
+    # The module and function name, which is what the phases are keyed by
+    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f'{module}.{frame.f_code.co_name}'
+
+
+def collapse(names: List[str]) -> str:
+    # One line of the collapsed stack format, outermost function first
+    phase = None
+    labelled = []
+    for name in names:
+        phase = PHASES.get(name, phase)
+        if name in HOT_FUNCTIONS and phase:
+            name = f'{name} [{phase}]'
+        labelled.append(name)
+    return ';'.join(labelled)
+
+
+class SolveProfiler:
+    # Profiles the code run inside it with cProfile while a second thread samples the stack of the profiled
+    # thread. Entering it again adds to the same profile, so a batch of solves ends up in one profile.
+    # Work done by other processes, like the workers of the cluster decomposition, is not seen.
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter()
+        self._thread_id = None
+        self._outer_frames = []
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self) -> 'SolveProfiler':
+        # The frames calling the profiler are left out of the samples, the references keep their ids unique
+        self._outer_frames = []
+        frame = sys._getframe(1)
+        while frame is not None:
+            self._outer_frames.append(frame)
+            frame = frame.f_back
+
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        self._outer_frames = []
+
+    def solve(self, algorithm: TreeSpanningAlgorithm) -> Tuple[List[Edge], float]:
+        with self:
+            return algorithm.solve()
+
+    def dump(self, path: str) -> Tuple[str, str]:
+        # Writes the pstats file and the collapsed stacks, which flamegraph.pl and speedscope read directly
+        stats_path, stacks_path = f'{path}.pstats', f'{path}.folded'
+        self.profile.dump_stats(stats_path)
+        with open(stacks_path, 'w') as stacks_file:
+            for stack, count in sorted(self.stacks.items()):
+                stacks_file.write(f'{stack} {count}\n')
+        return stats_path, stacks_path
+
+    def _sample(self) -> None:
+        outer = {id(frame) for frame in self._outer_frames}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id, None)
+            names, root = [], None
+            while frame is not None and id(frame) not in outer:
+                names.append(frame_name(frame))
+                root, frame = frame, frame.f_back
+            # Samples taken while the profiler itself starts or stops are left out
+            if root is not None and root.f_code.co_filename != __file__:
+                self.stacks[collapse(names[::-1])] += 1
+
+
+@contextmanager
+def profiled(path: str, interval: float = SAMPLE_INTERVAL) -> Iterator[SolveProfiler]:
+    # Profiles the solves inside the block and writes the profile when it ends, also when a solve fails
+    profiler = SolveProfiler(interval)
+    try:
+        with profiler:
+            yield profiler
+    finally:
+        profiler.dump(path)
@@ -0,0 +1,190 @@
+import math
+from typing import Callable, Dict, List, Optional
+
+import numpy
+
+from graph.graph import Vertex, eculidean_distance
+
+
+# Mean radius of the earth in kilometres, used by the haversine distance
+EARTH_RADIUS = 6371.0088
+
+ScalarDistance = Callable[[Vertex, Vertex], float]
+PairwiseKernel = Callable[[numpy.ndarray, numpy.ndarray], numpy.ndarray]
+
+
+class Metric:
+    # A distance function between two vertices and a kernel computing it between two arrays of points,
+    # where every row of an array is the x and y of a point. The kernel returns an array of shape
+    # (len(points1), len(points2)).
+
+    def __init__(self, name: str, distance: ScalarDistance, pairwise: PairwiseKernel):
+        self.name = name
+        self.distance = distance
+        self.pairwise = pairwise
+
+    def one_to_many(self, point: numpy.ndarray, points: numpy.ndarray) -> numpy.ndarray:
+        return self.pairwise(point[numpy.newaxis, :], points)[0]
+
+    def __repr__(self):
+        return f'Metric({self.name})'
+
+
+# Registered metrics by name and by their distance function, which is what the vertices hold
+METRICS: Dict[str, Metric] = dict()
+_METRICS_BY_DISTANCE: Dict[ScalarDistance, Metric] = dict()
+
+
+def register_metric(metric: Metric) -> Metric:
+    METRICS[metric.name] = metric
+    _METRICS_BY_DISTANCE[metric.distance] = metric
+    return metric
+
+
+def get_metric(name: str) -> Metric:
+    metric = METRICS.get(name, None)
+    if metric is None:
+        raise Exception(f'Unknown distance function {name}')
+    return metric
+
+
+def _differences(points1: numpy.ndarray, points2: numpy.ndarray):
+    dx = points2[numpy.newaxis, :, 0] - points1[:, numpy.newaxis, 0]
+    dy = points2[numpy.newaxis, :, 1] - points1[:, numpy.newaxis, 1]
+    return dx, dy
+
+
+def _euclidean_kernel(points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+    dx, dy = _differences(points1, points2)
+    return numpy.sqrt(dx * dx + dy * dy)
+
+
+def manhattan_distance(v1: Vertex, v2: Vertex) -> float:
+    return abs(v2.x - v1.x) + abs(v2.y - v1.y)
+
+
+def _manhattan_kernel(points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+    dx, dy = _differences(points1, points2)
+    return numpy.abs(dx) + numpy.abs(dy)
+
+
+def chebyshev_distance(v1: Vertex, v2: Vertex) -> float:
+    return max(abs(v2.x - v1.x), abs(v2.y - v1.y))
+
+
+def _chebyshev_kernel(points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+    dx, dy = _differences(points1, points2)
+    return numpy.maximum(numpy.abs(dx), numpy.abs(dy))
+
+
+def haversine_distance(v1: Vertex, v2: Vertex) -> float:
+    # Great circle distance in kilometres, x is the longitude and y the latitude in degrees
+    lat1, lat2 = math.radians(v1.y), math.radians(v2.y)
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin(math.radians(v2.x - v1.x) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _haversine_kernel(points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+    lat1 = numpy.radians(points1[:, numpy.newaxis, 1])
+    lat2 = numpy.radians(points2[numpy.newaxis, :, 1])
+    dlon = numpy.radians(points2[numpy.newaxis, :, 0] - points1[:, numpy.newaxis, 0])
+    a = numpy.sin((lat2 - lat1) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+class WeightedEuclidean:
+    # Euclidean distance where a unit along an axis costs as much as the square root of its weight. A class
+    # rather than a closure so the vertices holding it can be pickled and sent to worker processes, equal
+    # to any other instance with the same weights.
+
+    def __init__(self, x_weight: float, y_weight: float):
+        self.x_weight = x_weight
+        self.y_weight = y_weight
+
+    def __call__(self, v1: Vertex, v2: Vertex) -> float:
+        dx, dy = v2.x - v1.x, v2.y - v1.y
+        return math.sqrt(self.x_weight * dx * dx + self.y_weight * dy * dy)
+
+    def pairwise(self, points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+        dx, dy = _differences(points1, points2)
+        return numpy.sqrt(self.x_weight * dx * dx + self.y_weight * dy * dy)
+
+    def __eq__(self, other):
+        if not isinstance(other, WeightedEuclidean):
+            return NotImplemented
+        return (self.x_weight, self.y_weight) == (other.x_weight, other.y_weight)
+
+    def __hash__(self):
+        return hash((self.x_weight, self.y_weight))
+
+    def __repr__(self):
+        return f'WeightedEuclidean({self.x_weight},{self.y_weight})'
+
+
+def weighted_euclidean(x_weight: float, y_weight: float, name: Optional[str] = None) -> Metric:
+    # The metric of the weighted distance, kept so the batch kernel is found from the distance function of
+    # the vertices. Asking again for the same weights returns the metric already kept.
+    distance = WeightedEuclidean(x_weight, y_weight)
+    metric = _METRICS_BY_DISTANCE.get(distance, None)
+    if metric is None:
+        metric = Metric(name or f'weighted({x_weight},{y_weight})', distance, distance.pairwise)
+        _METRICS_BY_DISTANCE[distance] = metric
+    return metric
+
+
+EUCLIDEAN = register_metric(Metric('euclidian', eculidean_distance, _euclidean_kernel))
+MANHATTAN = register_metric(Metric('manhattan', manhattan_distance, _manhattan_kernel))
+CHEBYSHEV = register_metric(Metric('chebyshev', chebyshev_distance, _chebyshev_kernel))
+HAVERSINE = register_metric(Metric('haversine', haversine_distance, _haversine_kernel))
+WEIGHTED = register_metric(weighted_euclidean(1.0, 1.0, 'weighted'))
+
+
+def metric_of(vertices: List[Vertex]) -> Metric:
+    # The metric shared by the vertices. A distance function that is not a registered metric, or vertices
+    # with different functions, get a kernel calling the distance function of every vertex pair.
+    distances = {vertex.distance_function for vertex in vertices}
+    if len(distances) == 1:
+        distance = next(iter(distances))
+        metric = _METRICS_BY_DISTANCE.get(distance, None)
+        if metric is not None:
+            return metric
+        # Weights first seen in a worker process, which did not build the metric
+        if isinstance(distance, WeightedEuclidean):
+            return weighted_euclidean(distance.x_weight, distance.y_weight)
+    return _ScalarMetric(vertices)
+
+
+class _ScalarMetric(Metric):
+    def __init__(self, vertices: List[Vertex]):
+        # The kernel gets the points, the vertices are found again from their position
+        by_position = {(vertex.x, vertex.y): vertex for vertex in vertices}
+
+        def kernel(points1: numpy.ndarray, points2: numpy.ndarray) -> numpy.ndarray:
+            vertices1 = [by_position[tuple(point)] for point in points1.tolist()]
+            vertices2 = [by_position[tuple(point)] for point in points2.tolist()]
+            return numpy.array(
+                [[v1.distance_to(v2) for v2 in vertices2] for v1 in vertices1],
+                dtype=float,
+            ).reshape(len(vertices1), len(vertices2))
+
+        super().__init__('scalar', lambda v1, v2: v1.distance_to(v2), kernel)
+
+
+def coordinates(vertices: List[Vertex]) -> numpy.ndarray:
+    return numpy.array([(vertex.x, vertex.y) for vertex in vertices], dtype=float).reshape(len(vertices), 2)
+
+
+def distance_matrix(vertices1: List[Vertex], vertices2: Optional[List[Vertex]] = None) -> numpy.ndarray:
+    # Distances between every pair of vertices, computed by the batch kernel of their metric
+    if vertices2 is None:
+        vertices2 = vertices1
+    metric = metric_of(vertices1 + vertices2)
+    return metric.pairwise(coordinates(vertices1), coordinates(vertices2))
+
+
+def distances_from(vertex: Vertex, vertices: List[Vertex]) -> numpy.ndarray:
+    metric = metric_of([vertex] + vertices)
+    return metric.one_to_many(numpy.array([vertex.x, vertex.y], dtype=float), coordinates(vertices))
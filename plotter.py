@@ -1,44 +1,139 @@
 #!env/bin/python
 
-from matplotlib import pyplot
+import argparse
 import sys
 
-
-def plot_str_coords(coords: str, opts: str = None):
-    x, y = coords.split(',')
-    pyplot.plot(float(x), float(y), opts)
-
-
-def plot_line(coord1, coord2: str, opts: str = None):
-    x1, y1 = coord1.split(',')
-    x2, y2 = coord2.split(',')
-    pyplot.plot([float(x1), float(x2)], [float(y1), float(y2)], opts)
-
-
-name = sys.stdin.readline()
-total_distance = float(sys.stdin.readline())
-
-pyplot.title(f'{name}\ntotal distance: {total_distance:.2f}')
-
-for line in sys.stdin:
-    if not line.strip():
-        break
-    plot_str_coords(line, 'bo')
-
-
-for line in sys.stdin:
-    if not line.strip():
-        break
-
-    plot_str_coords(line, 'ro')
-
-
-for line in sys.stdin:
-    if not line.strip():
-        break
-
-    v1, v2 = line.split(';')
-    plot_line(v1, v2, 'b-')
-
-
-pyplot.show()
+import matplotlib
+import numpy
+
+# Edges shorter than this fraction of the plot extent are not visible and are dropped when decimating
+SUBPIXEL_FRACTION = 1 / 2000
+
+
+def read_block(lines) -> str:
+    # Read the lines until the next empty line
+    block = []
+    for line in lines:
+        if not line.strip():
+            break
+        block.append(line.strip())
+    return ','.join(block)
+
+
+def parse_coordinates(block: str, columns: int) -> numpy.ndarray:
+    if not block:
+        return numpy.empty((0, columns))
+    return numpy.array(block.replace(';', ',').split(','), dtype=float).reshape(-1, columns)
+
+
+def read_plottable(lines):
+    # Parses the output of tree_spanner.py --plottable
+    name = next(lines).strip()
+    total_distance = float(next(lines))
+    terminals = parse_coordinates(read_block(lines), 2)
+    vertices = parse_coordinates(read_block(lines), 2)
+    # Every edge is a row of x1, y1, x2, y2
+    edges = parse_coordinates(read_block(lines), 4)
+    return name, total_distance, terminals, vertices, edges
+
+
+def decimate(rows: numpy.ndarray, limit: int) -> numpy.ndarray:
+    # Keep at most limit evenly spaced rows
+    if limit is None or len(rows) <= limit:
+        return rows
+    return rows[numpy.linspace(0, len(rows) - 1, limit).astype(int)]
+
+
+def decimate_edges(edges: numpy.ndarray, limit: int) -> numpy.ndarray:
+    if limit is None or len(edges) <= limit:
+        return edges
+
+    # Drop the edges that would not cover a pixel before thinning out the rest
+    points = edges.reshape(-1, 2)
+    extent = numpy.max(numpy.ptp(points, axis=0))
+    lengths = numpy.hypot(edges[:, 2] - edges[:, 0], edges[:, 3] - edges[:, 1])
+    edges = edges[lengths >= extent * SUBPIXEL_FRACTION]
+
+    return decimate(edges, limit)
+
+
+def decimation_note(classes) -> str:
+    # Names how many of every class of rows are drawn, for the classes that were decimated
+    decimated = [f'{len(shown)} of {len(rows)} {label}' for label, shown, rows in classes if len(shown) < len(rows)]
+    if not decimated:
+        return ''
+    return f' (showing {", ".join(decimated)})'
+
+
+def plot(name, total_distance, terminals, vertices, edges, max_points=None, max_edges=None):
+    # Imported here so the backend can be picked before pyplot is loaded
+    from matplotlib import pyplot
+    from matplotlib.collections import LineCollection
+
+    shown_terminals = decimate(terminals, max_points)
+    shown_vertices = decimate(vertices, max_points)
+    shown_edges = decimate_edges(edges, max_edges)
+
+    title = f'{name}\ntotal distance: {total_distance:.2f}' + decimation_note([
+        ('terminals', shown_terminals, terminals),
+        ('optional vertices', shown_vertices, vertices),
+        ('edges', shown_edges, edges),
+    ])
+
+    figure, axes = pyplot.subplots()
+    axes.set_title(title)
+
+    axes.add_collection(LineCollection(shown_edges.reshape(-1, 2, 2), colors='b', linewidths=1))
+    axes.scatter(shown_terminals[:, 0], shown_terminals[:, 1], c='b', zorder=2)
+    axes.scatter(shown_vertices[:, 0], shown_vertices[:, 1], c='r', zorder=2)
+    axes.autoscale_view()
+
+    return figure
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Plots the output of tree_spanner.py --plottable read from stdin')
+    parser.add_argument(
+        '-o', '--out',
+        help='Write the plot to a file instead of showing it, the format follows the extension (png, svg, ...)',
+        type=str,
+        required=False,
+    )
+    parser.add_argument(
+        '--dpi',
+        help='Resolution of raster output files',
+        type=int,
+        default=150,
+    )
+    parser.add_argument(
+        '--max-points',
+        help='Maximum number of terminals and optional vertices to draw each, the rest are decimated',
+        type=int,
+        default=100000,
+    )
+    parser.add_argument(
+        '--max-edges',
+        help='Maximum number of edges to draw, the rest are decimated',
+        type=int,
+        default=100000,
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    if arguments.out:
+        # Headless backend, no display needed
+        matplotlib.use('Agg')
+
+    figure = plot(
+        *read_plottable(iter(sys.stdin)),
+        max_points=arguments.max_points,
+        max_edges=arguments.max_edges,
+    )
+
+    if arguments.out:
+        figure.savefig(arguments.out, dpi=arguments.dpi)
+    else:
+        matplotlib.pyplot.show()
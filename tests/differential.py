@@ -0,0 +1,196 @@
+import random
+from typing import Callable, List, Optional, Tuple, Type
+
+from algorithms.base_algorithm import TreeSpanningAlgorithm
+from algorithms.brute_force_mst import BruteForceMST
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.lower_bound import DualAscent, reduce_vertices
+from graph.graph import Edge, Vertex
+from tree_spanner import randomize_terms_and_vertices
+
+
+# Absolute tolerance when comparing costs
+TOLERANCE = 1e-9
+
+Instance = Tuple[List[Vertex], List[Vertex]]
+
+# Kinds of generated instances, the degenerate ones stress ties in the comparisons
+UNIFORM = 'uniform'
+DUPLICATES = 'duplicates'
+COLLINEAR = 'collinear'
+TIES = 'ties'
+KINDS = [UNIFORM, DUPLICATES, COLLINEAR, TIES]
+
+
+def random_instance(seed: int, max_terminals: int = 5, max_vertices: int = 4) -> Instance:
+    random.seed(seed)
+    kind = KINDS[seed % len(KINDS)]
+
+    terminals, vertices = randomize_terms_and_vertices(
+        random.randint(0, max_terminals),
+        random.randint(0, max_vertices),
+        0.0,
+        10.0,
+        0.0,
+        10.0,
+    )
+
+    if kind == DUPLICATES and terminals:
+        # Copy some of the terminals, as terminals and as optional vertices
+        for _ in range(random.randint(1, 2)):
+            original = random.choice(terminals)
+            target = random.choice([terminals, vertices])
+            target.insert(random.randint(0, len(target)), Vertex(original.x, original.y))
+    elif kind == COLLINEAR:
+        # Every vertex on the line y = slope * x + offset
+        slope, offset = random.choice([0.0, 1.0, -0.5]), random.uniform(0.0, 5.0)
+        for vertex in terminals + vertices:
+            vertex.y = slope * vertex.x + offset
+    elif kind == TIES:
+        # A small integer grid gives many edges of equal length
+        for vertex in terminals + vertices:
+            vertex.x, vertex.y = float(round(vertex.x / 4)), float(round(vertex.y / 4))
+
+    return terminals, vertices
+
+
+def validate(terminals: List[Vertex], vertices: List[Vertex], edges: List[Edge], total_cost: float) -> Optional[str]:
+    # Returns a description of why the solution is not a tree spanning every terminal, or None
+    allowed = set(terminals + vertices)
+    parent = {}
+
+    def find(vertex):
+        while parent.setdefault(vertex, vertex) != vertex:
+            vertex = parent[vertex]
+        return vertex
+
+    for e in edges:
+        if e.v1 not in allowed or e.v2 not in allowed:
+            return f'edge {e} uses an unknown vertex'
+        if e.v1 is e.v2:
+            return f'edge {e} is a self-loop'
+        if e.v1 == e.v2:
+            continue  # Zero length edge between two vertices at the same position
+        root1, root2 = find(e.v1), find(e.v2)
+        if root1 == root2:
+            return f'edge {e} closes a cycle'
+        parent[root1] = root2
+
+    if len({find(terminal) for terminal in terminals}) > 1:
+        return 'terminals are not connected'
+
+    edge_cost = sum(e.distance() for e in edges)
+    if abs(edge_cost - total_cost) > TOLERANCE:
+        return f'reported cost {total_cost} differs from the edge lengths {edge_cost}'
+
+    return None
+
+
+def optimal_cost(terminals: List[Vertex], vertices: List[Vertex]) -> float:
+    return BruteForceMST(list(terminals), list(vertices)).solve()[1]
+
+
+def check(algorithm: Type[TreeSpanningAlgorithm], terminals: List[Vertex], vertices: List[Vertex]) -> Optional[str]:
+    # Returns a description of how the algorithm disagrees with the brute force solution, or None
+    expected_total_cost = optimal_cost(terminals, vertices)
+
+    try:
+        edges, total_cost = algorithm(list(terminals), list(vertices)).solve()
+    except Exception as exception:
+        return f'raised {exception!r}'
+
+    error = validate(terminals, vertices, edges, total_cost)
+    if error:
+        return error
+
+    if abs(total_cost - expected_total_cost) > TOLERANCE:
+        return f'cost {total_cost} but the optimal cost is {expected_total_cost}'
+
+    return None
+
+
+def check_lower_bound(terminals: List[Vertex], vertices: List[Vertex]) -> Optional[str]:
+    # The dual ascent bound is never above the optimal cost
+    expected_total_cost = optimal_cost(terminals, vertices)
+    lower_bound = DualAscent(list(terminals), list(vertices)).solve()
+    if lower_bound > expected_total_cost + TOLERANCE:
+        return f'lower bound {lower_bound} above the optimal cost {expected_total_cost}'
+    return None
+
+
+def check_reduction(terminals: List[Vertex], vertices: List[Vertex]) -> Optional[str]:
+    # Reducing the optional vertices keeps the optimal cost, with the default upper bound that fixes nothing
+    # and with the optimal cost as upper bound that fixes as much as possible
+    expected_total_cost = optimal_cost(terminals, vertices)
+    for upper_bound in [None, expected_total_cost]:
+        total_cost = optimal_cost(*reduce_vertices(list(terminals), list(vertices), upper_bound))
+        if abs(total_cost - expected_total_cost) > TOLERANCE:
+            return f'reduced with upper bound {upper_bound} the cost is {total_cost} instead of {expected_total_cost}'
+    return None
+
+
+def check_updates(terminals: List[Vertex], vertices: List[Vertex]) -> Optional[str]:
+    # Dreyfus Wagner solved with half of the optional vertices, then updated with the other half added and
+    # the first half removed, agrees with the brute force solution after every update
+    half = len(vertices) // 2
+    algorithm = DreyfusWagnerAlgorithm(list(terminals), vertices[:half])
+    algorithm.solve()
+
+    removed = set(vertices[:half])
+    updates = [
+        (algorithm.add_optional_vertices, vertices[half:], vertices),
+        (algorithm.remove_optional_vertices, vertices[:half], [v for v in vertices if v not in removed]),
+    ]
+    for update, changed, current in updates:
+        update(changed)
+        edges, total_cost = algorithm.solve()
+        error = validate(terminals, current, edges, total_cost)
+        if error:
+            return f'after {update.__name__}: {error}'
+        expected_total_cost = optimal_cost(terminals, current)
+        if abs(total_cost - expected_total_cost) > TOLERANCE:
+            return f'after {update.__name__} the cost is {total_cost} but the optimal cost is {expected_total_cost}'
+    return None
+
+
+def check_subset_queries(terminals: List[Vertex], vertices: List[Vertex]) -> Optional[str]:
+    # The trees Dreyfus Wagner returns for subsets of the terminals after a solve are optimal for the subsets
+    algorithm = DreyfusWagnerAlgorithm(list(terminals), list(vertices))
+    algorithm.solve()
+
+    subsets = [terminals[i:] for i in range(len(terminals))] + [terminals[::2], terminals[1::2]]
+    for subset, (edges, total_cost) in zip(subsets, algorithm.trees_for(subsets)):
+        error = validate(subset, vertices, edges, total_cost)
+        if error:
+            return f'subset {subset}: {error}'
+        expected_total_cost = optimal_cost(subset, vertices)
+        for cost in [total_cost, algorithm.cost_for(subset)]:
+            if abs(cost - expected_total_cost) > TOLERANCE:
+                return f'subset {subset} costs {cost} but the optimal cost is {expected_total_cost}'
+    return None
+
+
+def shrink(
+    terminals: List[Vertex],
+    vertices: List[Vertex],
+    fails: Callable[[List[Vertex], List[Vertex]], bool],
+) -> Instance:
+    # Removes one vertex at a time as long as the instance keeps failing
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in (
+            [(terminals[:i] + terminals[i + 1:], vertices) for i in range(len(terminals))] +
+            [(terminals, vertices[:i] + vertices[i + 1:]) for i in range(len(vertices))]
+        ):
+            if fails(*candidate):
+                terminals, vertices = candidate
+                shrunk = True
+                break
+    return terminals, vertices
+
+
+def reproducer(terminals: List[Vertex], vertices: List[Vertex]) -> str:
+    def as_code(vertex_list):
+        return '[' + ', '.join(f'Vertex({v.x!r}, {v.y!r})' for v in vertex_list) + ']'
+    return f'terminals = {as_code(terminals)}\nvertices = {as_code(vertices)}'
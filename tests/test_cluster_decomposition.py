@@ -0,0 +1,142 @@
+import numpy
+import pytest
+import random
+
+from graph.graph import Vertex
+from algorithms.cluster_decomposition import (
+    MAX_CLUSTER_TERMINALS,
+    ClusterDecomposition,
+    closest_pair,
+    cluster_distances,
+    contracted_tree_cost,
+    join_tree,
+)
+from algorithms.dijkstra_steiner import DijkstraSteinerAlgorithm
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from graph.metrics import distance_matrix, weighted_euclidean
+
+
+def make_clusters(centres, optional_count):
+    # Terminals on the corners of a triangle around every centre, optional vertices inside of it
+    terminals, vertices = [], []
+    for x, y in centres:
+        terminals += [Vertex(x + dx, y + dy) for dx, dy in [(-1, -1), (1, -1), (0, 1)]]
+        vertices += [
+            Vertex(random.uniform(x - 0.5, x + 0.5), random.uniform(y - 0.5, y + 0.5))
+            for _ in range(optional_count)
+        ]
+    return terminals, vertices
+
+
+def test_empty():
+    assert ClusterDecomposition([], []).solve() == ([], 0.0)
+
+
+def test_no_optional_is_minimum_spanning_tree():
+    terminals = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0)]
+
+    edges, total_cost = ClusterDecomposition(terminals, [], workers=1).solve()
+
+    assert total_cost == 2
+    assert len(edges) == 2
+
+
+@pytest.mark.parametrize('seed,workers', [(0, 1), (1, 1), (2, 1), (3, 2)])
+def test_separated_clusters_match_dreyfus_wagner(seed, workers):
+    random.seed(seed)
+    terminals, vertices = make_clusters([(0, 0), (20, 0), (10, 20)], 2)
+
+    _, expected_total_cost = DreyfusWagnerAlgorithm(terminals, vertices).solve()
+
+    algorithm = ClusterDecomposition(terminals, vertices, workers=workers)
+    edges, total_cost = algorithm.solve()
+
+    assert algorithm.is_exact()
+    assert sorted(len(cluster) for cluster in algorithm.clusters()) == [3, 3, 3]
+    assert total_cost == pytest.approx(expected_total_cost)
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+    assert len(edges) == len({v for e in edges for v in (e.v1, e.v2)}) - 1
+
+
+def test_heuristic_split():
+    # Terminals on a line are too close to prove any split
+    terminals = [Vertex(float(x), 0.0) for x in range(6)]
+    vertices = [Vertex(0.5, 0.1), Vertex(4.5, 0.1)]
+
+    _, expected_total_cost = DreyfusWagnerAlgorithm(terminals, vertices).solve()
+
+    algorithm = ClusterDecomposition(terminals, vertices, workers=1, max_cluster_terminals=3)
+    edges, total_cost = algorithm.solve()
+
+    assert not algorithm.is_exact()
+    assert all(len(cluster) <= 3 for cluster in algorithm.clusters())
+    assert total_cost >= expected_total_cost - 1e-9
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+
+
+@pytest.mark.parametrize(
+    'terminals,vertices',
+    [
+        (
+            [Vertex(0, 0), Vertex(1, 0), Vertex(0, 1), Vertex(100, 100), Vertex(101, 100), Vertex(100, 101)],
+            [Vertex(1.2, 1.2), Vertex(100.3, 100.3)],
+        ),
+        (
+            [Vertex(0, 0), Vertex(2, 0), Vertex(1, 2), Vertex(30, 0), Vertex(32, 0), Vertex(31, 2)],
+            [Vertex(1, 0.6), Vertex(2.8, 0.4), Vertex(31, 0.6), Vertex(29.2, 0.4)],
+        ),
+    ]
+)
+def test_optional_vertices_outside_terminal_hulls(terminals, vertices):
+    # The optional vertices closest to the other cluster are outside the hull of the terminals
+    _, expected_total_cost = DijkstraSteinerAlgorithm(terminals, vertices).solve()
+
+    algorithm = ClusterDecomposition(terminals, vertices, workers=1)
+    _, total_cost = algorithm.solve()
+
+    assert algorithm.is_exact()
+    assert len(algorithm.clusters()) >= 2
+    assert total_cost == pytest.approx(expected_total_cost)
+
+
+def test_clusters_are_capped_by_default():
+    random.seed(0)
+    terminals = [Vertex(random.uniform(0, 10), random.uniform(0, 10)) for _ in range(2 * MAX_CLUSTER_TERMINALS)]
+
+    algorithm = ClusterDecomposition(terminals, [Vertex(5, 5)], workers=1)
+    edges, total_cost = algorithm.solve()
+
+    assert all(len(cluster) <= MAX_CLUSTER_TERMINALS for cluster in algorithm.clusters())
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+
+
+def test_weighted_metric_in_workers():
+    random.seed(4)
+    terminals, vertices = make_clusters([(0, 0), (20, 0), (10, 20)], 2)
+    for vertex in terminals + vertices:
+        vertex.distance_function = weighted_euclidean(1.0, 4.0).distance
+
+    _, expected_total_cost = DreyfusWagnerAlgorithm(terminals, vertices).solve()
+
+    algorithm = ClusterDecomposition(terminals, vertices, workers=2)
+    _, total_cost = algorithm.solve()
+
+    assert len(algorithm.clusters()) == 3
+    assert total_cost == pytest.approx(expected_total_cost)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_cluster_distances_match_closest_pairs(seed):
+    random.seed(seed)
+    terminals, vertices = make_clusters([(0, 0), (20, 0), (10, 20), (30, 30)], 2)
+    labels = [random.randrange(4) for _ in terminals + vertices]
+    labels[:4] = range(4)  # Every cluster has a vertex
+    groups = [[v for v, label in zip(terminals + vertices, labels) if label == i] for i in range(4)]
+
+    to_cluster, between = cluster_distances(distance_matrix(terminals + vertices), numpy.array(labels), 4)
+
+    for i in range(4):
+        for j in range(4):
+            assert between[i, j] == pytest.approx(closest_pair(groups[i], groups[j])[0])
+        assert to_cluster[:, i] == pytest.approx(distance_matrix(terminals + vertices, groups[i]).min(axis=1))
+    assert contracted_tree_cost(between) == pytest.approx(sum(edge[0] for edge in join_tree(groups)))
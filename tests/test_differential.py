@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+# Imported so every algorithm is registered
+import tree_spanner  # noqa: F401
+from algorithms.base_algorithm import registered_algorithms
+from algorithms.minimum_spanning_tree import MinimumSpanningTree
+from graph.graph import Vertex
+from graph.metrics import get_metric
+
+from tests.differential import (
+    check,
+    check_lower_bound,
+    check_reduction,
+    check_subset_queries,
+    check_updates,
+    random_instance,
+    reproducer,
+    shrink,
+    validate,
+)
+from tests.utils import make_edges
+
+
+# Number of random instances every algorithm is checked on
+INSTANCES = int(os.environ.get('DIFFERENTIAL_INSTANCES', 3000))
+
+# Metrics other than the euclidean one are checked on fewer instances
+METRIC_INSTANCES = max(INSTANCES // 10, 1)
+
+
+def assert_checks(name, check_instance, instances=INSTANCES, metric=None):
+    # Runs a check returning a description of what went wrong, or None, on random instances and reports the
+    # first failing instance shrunk to a minimal reproducer
+    for seed in range(instances):
+        terminals, vertices = random_instance(seed)
+        if metric is not None:
+            for vertex in terminals + vertices:
+                vertex.distance_function = get_metric(metric).distance
+
+        error = check_instance(terminals, vertices)
+        if error:
+            terminals, vertices = shrink(terminals, vertices, lambda t, v: check_instance(t, v) is not None)
+            pytest.fail(
+                f'{name} failed on seed {seed}: {error}\n'
+                f'Minimal reproducer ({check_instance(terminals, vertices)}):\n'
+                f'{reproducer(terminals, vertices)}'
+            )
+
+
+def check_algorithm(algorithm):
+    def check_instance(terminals, vertices):
+        # The minimum spanning tree only spans the terminals
+        return check(algorithm, terminals, [] if algorithm is MinimumSpanningTree else vertices)
+    return check_instance
+
+
+@pytest.mark.parametrize('algorithm', registered_algorithms(), ids=lambda algorithm: algorithm.__name__)
+def test_matches_brute_force(algorithm):
+    assert_checks(algorithm.__name__, check_algorithm(algorithm))
+
+
+@pytest.mark.parametrize('metric', ['manhattan', 'chebyshev', 'haversine', 'weighted'])
+@pytest.mark.parametrize('algorithm', registered_algorithms(), ids=lambda algorithm: algorithm.__name__)
+def test_matches_brute_force_with_metric(algorithm, metric):
+    assert_checks(f'{algorithm.__name__} with {metric}', check_algorithm(algorithm), METRIC_INSTANCES, metric)
+
+
+@pytest.mark.parametrize(
+    'check_instance',
+    [check_lower_bound, check_reduction, check_updates, check_subset_queries],
+    ids=lambda check_instance: check_instance.__name__,
+)
+def test_properties(check_instance):
+    assert_checks(check_instance.__name__, check_instance)
+
+
+@pytest.mark.parametrize(
+    'edges_indices,error',
+    [
+        ([(0, 1), (1, 2)], None),
+        ([(0, 1)], 'terminals are not connected'),
+        ([(0, 1), (1, 2), (2, 0)], 'closes a cycle'),
+        ([(0, 3), (1, 3), (2, 3)], 'unknown vertex'),
+        ([(0, 1), (1, 2), (1, 1)], 'self-loop'),
+        # A copy of a terminal at its position
+        ([(0, 1), (1, 2), (1, 4)], None),
+    ]
+)
+def test_validate(edges_indices, error):
+    terminals = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0)]
+    edges = make_edges(terminals + [Vertex(5, 5), Vertex(0, 1)], edges_indices)
+
+    result = validate(terminals, [], edges, sum(e.distance() for e in edges))
+
+    if error is None:
+        assert result is None
+    else:
+        assert error in result
+
+
+def test_shrink():
+    terminals = [Vertex(0, 0), Vertex(1, 1), Vertex(2, 2)]
+    vertices = [Vertex(3, 3), Vertex(4, 4)]
+
+    # Fails as long as the vertex (1, 1) is a terminal
+    assert shrink(terminals, vertices, lambda t, v: Vertex(1, 1) in t) == ([Vertex(1, 1)], [])
@@ -0,0 +1,97 @@
+import pytest
+import random
+from math import sqrt
+
+from graph.graph import Vertex
+from algorithms.dijkstra_steiner import DijkstraSteinerAlgorithm
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.lower_bound import DualAscent
+from algorithms.minimum_spanning_tree import MinimumSpanningTree
+from tree_spanner import randomize_terms_and_vertices
+
+from tests.differential import TOLERANCE, validate
+from tests.utils import make_edges
+
+
+@pytest.mark.parametrize(
+    'vertices,expected_total_cost,expected_edge_indices',
+    [
+        # Empty or single vertex graph, no cost or edges
+        ([], 0, []),
+        ([Vertex(1, 1)], 0, []),
+        # Two vertices should be conntected
+        ([Vertex(0, 0), Vertex(0, 1), ], 1, [(0, 1)]),
+        # Three vertices, connect both with the first node
+        ([Vertex(0, 0), Vertex(0, 1), Vertex(1, 0)], 2, [(0, 1), (0, 2)]),
+    ]
+)
+def test_no_optional(vertices, expected_total_cost, expected_edge_indices):
+
+    expected_edges = make_edges(vertices, expected_edge_indices)
+
+    edges, total_cost = DijkstraSteinerAlgorithm(vertices, []).solve()
+
+    assert expected_total_cost == total_cost
+    assert edges == expected_edges
+
+
+@pytest.mark.parametrize(
+    'vertices,optional_vertices,expected_total_cost,expected_edge_indices',
+    [
+        # Four vertices, connet through optional node in the middle
+        (
+            [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)],
+            [Vertex(0.5, 0.5)],
+            sqrt(0.5)*4,
+            # 4 is the optional vertex
+            [(0, 4), (1, 4), (2, 4), (3, 4)],
+        ),
+        # A single terminal never needs the optional vertex
+        ([Vertex(0, 0)], [Vertex(1, 1)], 0, []),
+        # The optional vertex is too far away to be useful
+        (
+            [Vertex(0, 0), Vertex(0, 1)],
+            [Vertex(5, 5)],
+            1,
+            [(0, 1)],
+        ),
+    ]
+)
+def test_with_optional_vertices(vertices, optional_vertices, expected_total_cost, expected_edge_indices):
+
+    expected_edges = make_edges(vertices + optional_vertices, expected_edge_indices)
+
+    edges, total_cost = DijkstraSteinerAlgorithm(vertices, optional_vertices).solve()
+
+    assert total_cost == pytest.approx(expected_total_cost)
+    # compare with set, order of edges does not matter for the solution
+    assert set(edges) == set(expected_edges)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_dreyfus_wagner(seed):
+    random.seed(seed)
+    terminals, vertices = randomize_terms_and_vertices(
+        random.randint(2, 6), random.randint(1, 5), 0.0, 10.0, 0.0, 10.0
+    )
+
+    _, expected_total_cost = DreyfusWagnerAlgorithm(terminals, vertices).solve()
+    edges, total_cost = DijkstraSteinerAlgorithm(terminals, vertices).solve()
+
+    assert total_cost == pytest.approx(expected_total_cost)
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+
+
+def test_many_terminals():
+    # Benchmark sized instance, far beyond what Dreyfus Wagner can solve
+    random.seed(0)
+    terminals, vertices = randomize_terms_and_vertices(24, 48, 0.0, 10.0, 0.0, 10.0)
+
+    algorithm = DijkstraSteinerAlgorithm(terminals, vertices)
+    edges, total_cost = algorithm.solve()
+
+    assert validate(terminals, vertices, edges, total_cost) is None
+    assert DualAscent(terminals, vertices).solve() <= total_cost + TOLERANCE
+    assert total_cost <= MinimumSpanningTree(terminals).solve()[1]
+    # The pruning keeps the search to a small part of the 2^23 * 72 possible labels
+    assert len(algorithm.labels) < 10000
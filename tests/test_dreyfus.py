@@ -3,6 +3,7 @@ from math import sqrt
 
 from graph.graph import Vertex
 from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from graph.metrics import WeightedEuclidean, weighted_euclidean
 
 from tests.utils import make_edges
 
@@ -50,3 +51,100 @@ def test_with_optional_vertices(vertices, optional_vertices, expected_total_cost
 
     assert expected_total_cost == total_cost
     assert edges == expected_edges
+
+
+def test_add_and_remove_optional_vertices():
+    vertices = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)]
+    far_away, centre = Vertex(5, 5), Vertex(0.5, 0.5)
+
+    algorithm = DreyfusWagnerAlgorithm(vertices, [far_away])
+    assert algorithm.solve()[1] == 3
+
+    algorithm.add_optional_vertices([centre])
+    edges, total_cost = algorithm.solve()
+    assert total_cost == pytest.approx(sqrt(0.5)*4)
+    assert set(edges) == set(make_edges(vertices + [centre], [(0, 4), (1, 4), (2, 4), (3, 4)]))
+
+    algorithm.remove_optional_vertices([centre])
+    assert algorithm.solve()[1] == 3
+
+
+def test_subset_queries():
+    vertices = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)]
+    centre = Vertex(0.5, 0.5)
+
+    algorithm = DreyfusWagnerAlgorithm(vertices, [centre])
+    algorithm.solve()
+
+    assert algorithm.cost_for(vertices) == pytest.approx(sqrt(0.5)*4)
+    assert algorithm.cost_for(vertices[1:]) == 2
+    assert algorithm.cost_for(vertices[:2]) == 1
+    assert algorithm.cost_for(vertices[:1]) == 0
+    assert set(algorithm.tree_for(vertices)) == set(make_edges(vertices + [centre], [(0, 4), (1, 4), (2, 4), (3, 4)]))
+
+    with pytest.raises(ValueError):
+        algorithm.cost_for([centre])
+
+
+@pytest.mark.parametrize('optional_vertices', [[], [Vertex(0.5, 0.5)]])
+def test_subset_queries_reject_non_terminals(optional_vertices):
+    vertices = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)]
+
+    algorithm = DreyfusWagnerAlgorithm(vertices, optional_vertices)
+    algorithm.solve()
+
+    with pytest.raises(ValueError):
+        algorithm.cost_for(vertices[:2] + [Vertex(5, 5)])
+    with pytest.raises(ValueError):
+        algorithm.trees_for([vertices, vertices[:2] + [Vertex(5, 5)]])
+
+
+def test_subset_queries_split_at_optional_vertex_on_terminal():
+    # The optional vertex at the position of the left out terminal (1, 1) is still a Steiner vertex
+    terminals = [Vertex(2, 1), Vertex(1, 1), Vertex(0, 2), Vertex(1, 2), Vertex(1, 0)]
+    subset = [terminals[0], terminals[2], terminals[4]]
+
+    algorithm = DreyfusWagnerAlgorithm(terminals, [Vertex(1, 1)])
+    algorithm.solve()
+    edges, total_cost = algorithm.trees_for([subset])[0]
+
+    assert total_cost == pytest.approx(2 + sqrt(2))
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+    assert algorithm.cost_for(subset) == pytest.approx(2 + sqrt(2))
+
+
+def test_subset_queries_return_own_lists():
+    vertices = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)]
+
+    algorithm = DreyfusWagnerAlgorithm(vertices, [Vertex(0.5, 0.5)])
+    algorithm.solve()
+
+    (edges, _), (same_edges, _) = algorithm.trees_for([vertices, vertices])
+    edges.clear()
+
+    assert len(same_edges) == 4
+    assert len(algorithm.tree_for(vertices)) == 4
+
+
+def test_distances_come_from_the_batch_kernel(monkeypatch):
+    distance = weighted_euclidean(1.0, 2.0).distance
+    terminals = [Vertex(0, 0, distance), Vertex(0, 2, distance), Vertex(3, 1, distance), Vertex(4, 4, distance)]
+    vertices = [Vertex(1, 1, distance), Vertex(3, 3, distance)]
+    _, expected_total_cost = DreyfusWagnerAlgorithm(terminals, vertices).solve()
+
+    def scalar_distance(*_):
+        raise AssertionError('the scalar distance function was called')
+    monkeypatch.setattr(WeightedEuclidean, '__call__', scalar_distance)
+
+    algorithm = DreyfusWagnerAlgorithm(terminals, vertices[:1])
+    algorithm.solve()
+    algorithm.add_optional_vertices(vertices[1:])
+
+    assert algorithm.solve()[1] == pytest.approx(expected_total_cost)
+
+    # The same number of vertices, but not the same vertices
+    replaced = vertices[1:] + [Vertex(2, 2, distance)]
+    algorithm.remove_optional_vertices(vertices[:1])
+    algorithm.add_optional_vertices(replaced[1:])
+
+    assert algorithm.solve()[1] == pytest.approx(DreyfusWagnerAlgorithm(terminals, replaced).solve()[1])
@@ -0,0 +1,83 @@
+import pytest
+from math import sqrt
+
+from graph.graph import Vertex
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.lower_bound import DualAscent, optimality_gap, reduce_vertices, solve_with_bound
+from algorithms.minimum_spanning_tree import MinimumSpanningTree
+
+from tests.differential import TOLERANCE
+
+
+SQUARE = [Vertex(0, 0), Vertex(0, 1), Vertex(1, 0), Vertex(1, 1)]
+
+
+@pytest.mark.parametrize(
+    'terminals,vertices,expected_lower_bound',
+    [
+        ([], [], 0),
+        ([Vertex(1, 1)], [Vertex(0, 0)], 0),
+        ([Vertex(0, 0), Vertex(0, 1)], [], 1),
+        (SQUARE, [], 3),
+        (SQUARE, [Vertex(0.5, 0.5)], sqrt(0.5)*4),
+    ]
+)
+def test_lower_bound(terminals, vertices, expected_lower_bound):
+    assert DualAscent(terminals, vertices).solve() == pytest.approx(expected_lower_bound)
+
+
+def test_eliminated_and_fixed_vertices():
+    centre, far_away = Vertex(0.5, 0.5), Vertex(5, 5)
+    dual_ascent = DualAscent(SQUARE, [centre, far_away])
+    dual_ascent.solve()
+
+    assert dual_ascent.eliminated_vertices(3) == [far_away]
+    assert dual_ascent.fixed_vertices(sqrt(0.5)*4) == [centre]
+
+
+@pytest.mark.parametrize(
+    'upper_bound,expected_terminals,expected_vertices',
+    [
+        # The spanning tree of the terminals fixes nothing, the far away vertex is in no cheaper tree
+        (None, SQUARE, [Vertex(0.5, 0.5)]),
+        (3, SQUARE, [Vertex(0.5, 0.5)]),
+        # Only trees through the centre cost as little as the optimal cost
+        (sqrt(0.5)*4, SQUARE + [Vertex(0.5, 0.5)], []),
+    ]
+)
+def test_reduce_vertices(upper_bound, expected_terminals, expected_vertices):
+    terminals, vertices = reduce_vertices(SQUARE, [Vertex(0.5, 0.5), Vertex(5, 5)], upper_bound)
+
+    assert terminals == expected_terminals
+    assert vertices == expected_vertices
+
+
+@pytest.mark.parametrize(
+    'total_cost,lower_bound,expected_gap',
+    [
+        (0, 0, 0),
+        (2, 2, 0),
+        (4, 3, 0.25),
+        (4, 5, 0),
+    ]
+)
+def test_optimality_gap(total_cost, lower_bound, expected_gap):
+    assert optimality_gap(total_cost, lower_bound) == expected_gap
+
+
+@pytest.mark.parametrize(
+    'algorithm,vertices,expected_total_cost,expected_gap',
+    [
+        (DreyfusWagnerAlgorithm, [Vertex(0.5, 0.5)], sqrt(0.5)*4, 0),
+        (MinimumSpanningTree, [], 3, 0),
+        # The spanning tree leaves out the optional vertex that makes the optimal tree cheaper
+        (MinimumSpanningTree, [Vertex(0.5, 0.5)], 3, (3 - sqrt(0.5)*4) / 3),
+    ]
+)
+def test_solve_with_bound(algorithm, vertices, expected_total_cost, expected_gap):
+    edges, total_cost, lower_bound, gap = solve_with_bound(algorithm(SQUARE, vertices), SQUARE, vertices)
+
+    assert total_cost == pytest.approx(expected_total_cost)
+    assert sum(e.distance() for e in edges) == pytest.approx(total_cost)
+    assert lower_bound <= total_cost + TOLERANCE
+    assert gap == pytest.approx(expected_gap)
@@ -0,0 +1,104 @@
+import argparse
+import pickle
+import random
+import sys
+
+import numpy
+import pytest
+
+import tree_spanner
+from graph.graph import Vertex
+from graph.metrics import (
+    EUCLIDEAN,
+    METRICS,
+    coordinates,
+    distance_matrix,
+    distances_from,
+    get_metric,
+    metric_of,
+    weighted_euclidean,
+)
+
+
+@pytest.mark.parametrize(
+    'name,v1,v2,expected_distance',
+    [
+        ('euclidian', Vertex(0, 0), Vertex(3, 4), 5),
+        ('manhattan', Vertex(0, 0), Vertex(3, -4), 7),
+        ('chebyshev', Vertex(0, 0), Vertex(3, -4), 4),
+        ('weighted', Vertex(0, 0), Vertex(3, 4), 5),
+        ('haversine', Vertex(0, 0), Vertex(0, 90), 10007.5),
+        ('haversine', Vertex(0, 0), Vertex(1, 0), 111.195),
+    ]
+)
+def test_metric_distance(name, v1, v2, expected_distance):
+    distance = get_metric(name).distance
+    assert distance(v1, v2) == distance(v2, v1) == pytest.approx(expected_distance, rel=1e-3)
+
+
+@pytest.mark.parametrize('metric', list(METRICS.values()) + [weighted_euclidean(0.5, 3.0)], ids=repr)
+def test_kernels_match_distance(metric):
+    random.seed(0)
+    vertices = [Vertex(random.uniform(-80, 80), random.uniform(-80, 80), metric.distance) for _ in range(12)]
+    expected = numpy.array([[metric.distance(v1, v2) for v2 in vertices] for v1 in vertices])
+
+    assert metric_of(vertices) is metric
+    assert numpy.allclose(distance_matrix(vertices), expected)
+    assert numpy.allclose(distance_matrix(vertices[:5], vertices[5:]), expected[:5, 5:])
+    assert numpy.allclose(distances_from(vertices[3], vertices), expected[3])
+    assert numpy.allclose(metric.one_to_many(coordinates(vertices)[3], coordinates(vertices)), expected[3])
+
+
+def test_unregistered_distance_function():
+    def doubled(v1, v2):
+        return 2 * EUCLIDEAN.distance(v1, v2)
+
+    vertices = [Vertex(0, 0, doubled), Vertex(3, 4, doubled)]
+
+    assert metric_of(vertices) not in METRICS.values()
+    assert numpy.array_equal(distance_matrix(vertices), [[0, 10], [10, 0]])
+    assert numpy.array_equal(distances_from(vertices[0], vertices[1:]), [10])
+
+
+def test_weighted_euclidean_is_kept_by_weights():
+    metric = weighted_euclidean(0.5, 3.0)
+    distance = pickle.loads(pickle.dumps(metric.distance))
+
+    assert weighted_euclidean(0.5, 3.0) is metric
+    assert weighted_euclidean(1.0, 1.0) is METRICS['weighted']
+    assert distance == metric.distance and hash(distance) == hash(metric.distance)
+    assert metric_of([Vertex(0, 0, distance), Vertex(1, 1, distance)]) is metric
+
+
+def test_pick_distance_function():
+    assert tree_spanner.pick_distance_function('euclidian') is EUCLIDEAN.distance
+    weighted = tree_spanner.pick_distance_function('weighted', [1.0, 4.0])
+    assert weighted(Vertex(0, 0), Vertex(0, 1)) == 2
+
+    with pytest.raises(Exception):
+        tree_spanner.pick_distance_function('unknown')
+
+
+@pytest.mark.parametrize('weights,expected_weights', [('1,4', [1.0, 4.0]), ('0.5,2.5', [0.5, 2.5])])
+def test_parse_weights(weights, expected_weights):
+    assert tree_spanner.parse_weights(weights) == expected_weights
+
+
+@pytest.mark.parametrize('weights', ['1', '1,2,3', '', 'a,b', '0,1', '-1,1'])
+def test_parse_invalid_weights(weights):
+    with pytest.raises(argparse.ArgumentTypeError):
+        tree_spanner.parse_weights(weights)
+
+
+@pytest.mark.parametrize(
+    'arguments',
+    [
+        ['--weights', '1,4', '-t', '0,0'],
+        ['-d', 'manhattan', '--weights', '1,4', '-t', '0,0'],
+        ['-d', 'weighted', '--weights', '1', '-t', '0,0'],
+    ]
+)
+def test_weights_rejected(monkeypatch, arguments):
+    monkeypatch.setattr(sys, 'argv', ['tree_spanner.py'] + arguments)
+    with pytest.raises(SystemExit):
+        tree_spanner.parse_arguments()
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+
+import numpy
+import pytest
+
+# The plotter is a development tool, matplotlib is not a test requirement
+pytest.importorskip('matplotlib')
+
+from plotter import decimate, decimate_edges, decimation_note, read_plottable  # noqa: E402
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(script, arguments, stdin=None):
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT, script)] + arguments,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+    ).stdout
+
+
+def plottable(arguments):
+    return run('tree_spanner.py', arguments + ['--plottable'])
+
+
+def test_read_plottable():
+    output = plottable(['-a', 'dfw', '-r', '--tcount', '5', '--vcount', '3', '--seed', '1'])
+
+    name, total_distance, terminals, vertices, edges = read_plottable(iter(output.splitlines()))
+
+    assert name == 'DreyfusWagnerAlgorithm'
+    assert terminals.shape == (5, 2)
+    assert vertices.shape == (3, 2)
+    assert edges.shape[1] == 4 and len(edges) >= 4
+    lengths = numpy.hypot(edges[:, 2] - edges[:, 0], edges[:, 3] - edges[:, 1])
+    assert lengths.sum() == pytest.approx(total_distance)
+
+
+def test_read_plottable_empty_blocks():
+    output = plottable(['-t', '1.0,1.0'])
+
+    _, total_distance, terminals, vertices, edges = read_plottable(iter(output.splitlines()))
+
+    assert total_distance == 0
+    assert terminals.shape == (1, 2)
+    assert vertices.shape == (0, 2)
+    assert edges.shape == (0, 4)
+
+
+@pytest.mark.parametrize('count,limit,expected_count', [(10, None, 10), (10, 20, 10), (10, 4, 4), (0, 4, 0)])
+def test_decimate(count, limit, expected_count):
+    rows = numpy.arange(count * 2, dtype=float).reshape(-1, 2)
+
+    decimated = decimate(rows, limit)
+
+    assert decimated.shape == (expected_count, 2)
+    if expected_count:
+        # The first and the last rows are kept
+        assert (decimated[0] == rows[0]).all() and (decimated[-1] == rows[-1]).all()
+
+
+def test_decimate_edges_drops_subpixel_edges_first():
+    long_edges = numpy.array([[0, 0, 100, 0], [0, 0, 0, 100], [100, 0, 100, 100]], dtype=float)
+    short_edges = numpy.array([[50, 50, 50.001, 50]] * 10, dtype=float)
+    edges = numpy.concatenate([short_edges, long_edges])
+
+    assert decimate_edges(edges, None) is edges
+    assert (decimate_edges(edges, 5) == long_edges).all()
+    assert len(decimate_edges(edges, 2)) == 2
+
+
+@pytest.mark.parametrize(
+    'shown_counts,expected_note',
+    [
+        ((5, 2, 6), ''),
+        ((3, 2, 6), ' (showing 3 of 5 terminals)'),
+        ((5, 1, 4), ' (showing 1 of 2 optional vertices, 4 of 6 edges)'),
+    ]
+)
+def test_decimation_note(shown_counts, expected_note):
+    counts = {'terminals': 5, 'optional vertices': 2, 'edges': 6}
+    classes = [
+        (label, numpy.zeros((shown, 2)), numpy.zeros((count, 2)))
+        for (label, count), shown in zip(counts.items(), shown_counts)
+    ]
+
+    assert decimation_note(classes) == expected_note
+
+
+def test_render_to_file(tmp_path):
+    out = tmp_path / 'tree.png'
+    output = plottable(['-a', 'mst', '-r', '--tcount', '20', '--seed', '2'])
+
+    run('plotter.py', ['-o', str(out), '--dpi', '50', '--max-edges', '5'], stdin=output)
+
+    with open(out, 'rb') as image:
+        assert image.read(8) == b'\x89PNG\r\n\x1a\n'
@@ -0,0 +1,70 @@
+import pstats
+import random
+
+import pytest
+
+from graph.graph import Vertex
+from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.profiling import SolveProfiler, collapse, profiled
+
+from tests.differential import random_instance
+from tree_spanner import randomize_terms_and_vertices
+
+
+@pytest.mark.parametrize(
+    'names,expected_stack',
+    [
+        ([], ''),
+        (['graph.eculidean_distance'], 'graph.eculidean_distance'),
+        (
+            ['minimum_spanning_tree.solve', 'graph.__lt__'],
+            'minimum_spanning_tree.solve;graph.__lt__ [spanning tree]',
+        ),
+        (
+            ['dreyfus_wagner._connect_vertex', 'dreyfus_wagner._split_vertex', 'dreyfus_wagner._best_split'],
+            'dreyfus_wagner._connect_vertex;dreyfus_wagner._split_vertex;dreyfus_wagner._best_split [split]',
+        ),
+        (
+            ['dreyfus_wagner._split_vertex', 'dreyfus_wagner._connect_vertex', 'graph.eculidean_distance'],
+            'dreyfus_wagner._split_vertex;dreyfus_wagner._connect_vertex;graph.eculidean_distance [connect]',
+        ),
+    ]
+)
+def test_collapse(names, expected_stack):
+    assert collapse(names) == expected_stack
+
+
+def test_profiled_solve(tmp_path):
+    random.seed(1)
+    terminals, vertices = randomize_terms_and_vertices(7, 3, 0.0, 10.0, 0.0, 10.0)
+    path = str(tmp_path / 'solve')
+
+    with profiled(path, interval=0.0001):
+        DreyfusWagnerAlgorithm(terminals, vertices).solve()
+
+    stats = pstats.Stats(f'{path}.pstats')
+    assert any(function == '_best_split' for _, _, function in stats.stats)
+
+    with open(f'{path}.folded') as stacks_file:
+        for line in stacks_file:
+            stack, count = line.rsplit(' ', 1)
+            assert stack.startswith('dreyfus_wagner.solve')
+            assert int(count) > 0
+            # Every split is labelled with its phase
+            assert 'dreyfus_wagner._best_split;' not in stack + ';'
+
+
+def test_profiled_batch(tmp_path):
+    profiler = SolveProfiler()
+    for seed in range(3):
+        terminals, vertices = random_instance(seed)
+        profiler.solve(DreyfusWagnerAlgorithm(terminals, vertices + [Vertex(5, 5)]))
+
+    stats_path, _ = profiler.dump(str(tmp_path / 'batch'))
+
+    stats = pstats.Stats(stats_path)
+    calls = [
+        primitive_calls for (_, _, function), (primitive_calls, *_) in stats.stats.items()
+        if function == 'solve'
+    ]
+    assert 3 in calls
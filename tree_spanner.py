@@ -3,25 +3,48 @@
 import argparse
 import random
 
+from contextlib import nullcontext
 from datetime import datetime
 
+from algorithms.cluster_decomposition import MAX_CLUSTER_TERMINALS, ClusterDecomposition
+from algorithms.dijkstra_steiner import DijkstraSteinerAlgorithm
 from algorithms.dreyfus_wagner import DreyfusWagnerAlgorithm
+from algorithms.lower_bound import bound_and_gap, reduce_vertices
 from algorithms.minimum_spanning_tree import MinimumSpanningTree
-from graph.graph import Vertex, eculidean_distance
+from algorithms.profiling import profiled
+from graph.graph import Vertex
+from graph.metrics import METRICS, get_metric, weighted_euclidean
 
 
 def pick_algorithm(algorithm):
     if algorithm == 'dfw':
         return DreyfusWagnerAlgorithm
+    if algorithm == 'cdw':
+        return ClusterDecomposition
+    if algorithm == 'dst':
+        return DijkstraSteinerAlgorithm
     if algorithm == 'mst':
         return MinimumSpanningTree
     raise Exception(f'Unknown algorithm {algorithm}')
 
 
-def pick_distance_function(distance_function):
-    if distance_function == 'euclidian':
-        return eculidean_distance
-    raise Exception(f'Unknown distance function {distance_function}')
+def pick_distance_function(distance_function, weights=None):
+    if distance_function == 'weighted' and weights:
+        return weighted_euclidean(*weights).distance
+    return get_metric(distance_function).distance
+
+
+def parse_weights(weights):
+    # The x and y weights of the weighted distance function, in the form of x,y
+    try:
+        parsed = [float(weight) for weight in weights.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{weights} are not numbers')
+    if len(parsed) != 2:
+        raise argparse.ArgumentTypeError(f'expected two weights in the form of x,y, got {weights}')
+    if min(parsed) <= 0:
+        raise argparse.ArgumentTypeError(f'weights must be positive, got {weights}')
+    return parsed
 
 
 def randomize_terms_and_vertices(
@@ -49,17 +72,38 @@ def parse_arguments():
     parser.add_argument(
         '-a', '---algorithm',
         default='mst',
-        help='The algorithm to run Dreyfus Wagner (dwf), Minimum Spanning tree (mst). Default mst',
-        choices=['dfw', 'mst'],
+        help=(
+            'The algorithm to run Dreyfus Wagner (dwf), Dreyfus Wagner on separated clusters (cdw), '
+            'Dijkstra Steiner (dst), Minimum Spanning tree (mst). Default mst'
+        ),
+        choices=['dfw', 'cdw', 'dst', 'mst'],
         type=str
     )
     parser.add_argument(
         '-d', '--distance_function',
-        help='Function to calculate distance between vertices.',
+        help=(
+            'Function to calculate distance between vertices. The haversine distance reads x as the '
+            'longitude and y as the latitude in degrees and measures kilometres.'
+        ),
         default='euclidian',
-        choices=['euclidian'],
+        choices=sorted(METRICS),
         type=str,
     )
+    parser.add_argument(
+        '--weights',
+        help='Weights of the x and y axis for the weighted distance function, for example 1.0,4.0',
+        type=parse_weights,
+        required=False,
+    )
+    parser.add_argument(
+        '--max-cluster-terminals',
+        help=(
+            'Largest cluster solved as is by cdw when no split can be proven, larger clusters are split '
+            f'heuristically. 0 never splits heuristically. Default {MAX_CLUSTER_TERMINALS}'
+        ),
+        type=int,
+        default=MAX_CLUSTER_TERMINALS,
+    )
     parser.add_argument(
         '-t', '--terminals',
         help='List of terminal vertices in the form of x1,y1 x2,y2 ... . For example 1.0,1.0 2.0,2.0',
@@ -69,7 +113,10 @@ def parse_arguments():
     )
     parser.add_argument(
         '-v', '--vertices',
-        help='List of optional vertices, same format as terminals. Only used if the algorithm is Dreyfus Wagner.',
+        help=(
+            'List of optional vertices, same format as terminals. '
+            'Not used by the minimum spanning tree.'
+        ),
         type=Vertex.from_str,
         nargs='+',
         default=[],
@@ -118,12 +165,27 @@ def parse_arguments():
         type=int,
         required=False,
     )
+    parser.add_argument(
+        '--reduce',
+        help='Remove optional verticies that are in no optimal tree before solving',
+        action='store_true',
+        default=False,
+    )
     parser.add_argument(
         '--time',
         help='Measure the time of the solution',
         action='store_true',
         default=False,
     )
+    parser.add_argument(
+        '--profile',
+        help=(
+            'Profile the solution and write PROFILE.pstats and collapsed stacks for flame graphs '
+            'to PROFILE.folded'
+        ),
+        type=str,
+        required=False,
+    )
     parser.add_argument(
         '-q', '--quiet',
         help='Supress output',
@@ -137,8 +199,10 @@ def parse_arguments():
         default=False,
     )
     arguments = parser.parse_args()
+    if arguments.weights is not None and arguments.distance_function != 'weighted':
+        parser.error('--weights can only be used with the weighted distance function')
     arguments.algorithm = pick_algorithm(arguments.algorithm)
-    arguments.distance_function = pick_distance_function(arguments.distance_function)
+    arguments.distance_function = pick_distance_function(arguments.distance_function, arguments.weights)
 
     if arguments.random:
         if arguments.seed:
@@ -174,19 +238,47 @@ if __name__ == '__main__':
     if arguments.time:
         mark = datetime.now()
 
-    edges, total_cost = arguments.algorithm(arguments.terminals, arguments.vertices).solve()
+    profiling = profiled(arguments.profile) if arguments.profile else nullcontext()
+    with profiling:
+        terminals, vertices = arguments.terminals, arguments.vertices
+        if arguments.reduce:
+            terminals, vertices = reduce_vertices(terminals, vertices)
+            if not (arguments.quiet or arguments.plottable):
+                print(
+                    f'Reduced to {len(terminals)} terminal(s) and '
+                    f'{len(vertices)} optional node(s).'
+                )
+
+        if arguments.algorithm is ClusterDecomposition:
+            algorithm = ClusterDecomposition(
+                terminals,
+                vertices,
+                max_cluster_terminals=arguments.max_cluster_terminals or None,
+            )
+        else:
+            algorithm = arguments.algorithm(terminals, vertices)
+        edges, total_cost = algorithm.solve()
+
+    if arguments.profile:
+        if not (arguments.quiet or arguments.plottable):
+            print(f'Profile written to {arguments.profile}.pstats and {arguments.profile}.folded')
 
     if mark:
         time = datetime.now() - mark
         if not (arguments.quiet or arguments.plottable):
             print(f'Solution took {time.total_seconds()} s')
 
+    # The bound is not part of the timed and profiled solve, and not needed when nothing is printed
+    if not arguments.quiet:
+        lower_bound, gap = bound_and_gap(total_cost, terminals, vertices)
+
     if not (arguments.quiet or arguments.plottable):
         print('Edges:')
         for e in edges:
             print(f'\t{e}')
 
         print(f'Total edge length: {total_cost:.2f}')
+        print(f'Lower bound: {lower_bound:.2f}, gap: {100 * gap:.2f}%')
 
     if arguments.plottable:
         print(arguments.algorithm.__name__)
@@ -203,3 +295,7 @@ if __name__ == '__main__':
         for e in edges:
             print(f'{e.v1.x},{e.v1.y};{e.v2.x},{e.v2.y}')
         print()  # line feed
+
+        print(lower_bound)
+        print(gap)
+        print()  # line feed